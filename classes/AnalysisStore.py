@@ -0,0 +1,196 @@
+from typing import Dict, Iterable, List, Optional
+import glob
+import json
+import os
+import re
+import sqlite3
+import threading
+
+# Conventional location: {video_name}/analysis.db, next to the segment_analysis directory
+DEFAULT_STORE_NAME = "analysis.db"
+# Bytes of the database file SQLite may memory-map for reads
+DEFAULT_MMAP_SIZE = 256 * 1024 * 1024
+
+# Each row keeps its dict as written in `data` (JSON), so values come back with their original types (an int target
+# id stays an int, "3" stays a string). The typed columns hold normalized copies (TEXT ids, REAL times) of the fields
+# the indexes and get_events use; they are never read back into results.
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS segments (segment_id INTEGER PRIMARY KEY, data TEXT NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS targets ("
+    "segment_id INTEGER NOT NULL, position INTEGER NOT NULL, target_id TEXT, label TEXT, time REAL, "
+    "data TEXT NOT NULL, PRIMARY KEY (segment_id, position))",
+    "CREATE TABLE IF NOT EXISTS events ("
+    "segment_id INTEGER NOT NULL, position INTEGER NOT NULL, event_id TEXT, event_type TEXT, start_time REAL, "
+    "description TEXT, particularity REAL, data TEXT NOT NULL, PRIMARY KEY (segment_id, position))",
+    "CREATE INDEX IF NOT EXISTS idx_targets_label ON targets (label)",
+    "CREATE INDEX IF NOT EXISTS idx_targets_time ON targets (time)",
+    "CREATE INDEX IF NOT EXISTS idx_events_type ON events (event_type)",
+    "CREATE INDEX IF NOT EXISTS idx_events_time ON events (start_time)",
+    "CREATE INDEX IF NOT EXISTS idx_events_id ON events (event_id)",
+]
+
+
+def _dumps(value) -> Optional[str]:
+    return None if value is None else json.dumps(value, ensure_ascii=False)
+
+
+def _text(value) -> Optional[str]:
+    return None if value is None else str(value)
+
+
+def _number(value) -> Optional[float]:
+    try:
+        return None if value is None else float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class AnalysisStore:
+    """
+    SQLite store of segment analysis results: one typed table each for segments, targets and events.
+
+    Results are written as they are produced (one transaction per segment, replacing earlier rows) and read back
+    as the same dicts the segment_N.json files hold. WAL mode lets readers run while the analysis appends, and
+    reads go through a memory-mapped database file.
+    """
+
+    def __init__(self, db_path: str, mmap_size: int = DEFAULT_MMAP_SIZE):
+        self.db_path = db_path
+        self.lock = threading.Lock()  # one connection shared by the writer and reader threads
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+        with self.connection:
+            for statement in SCHEMA:
+                self.connection.execute(statement)
+
+    @classmethod
+    def for_video(cls, video_name: str) -> 'AnalysisStore':
+        os.makedirs(video_name, exist_ok=True)
+        return cls(os.path.join(video_name, DEFAULT_STORE_NAME))
+
+    def write_result(self, segment_id, result: dict):
+        """Store (or replace) one segment's parsed result."""
+        segment_id = int(segment_id)
+        targets = [t for t in result.get("targets") or [] if isinstance(t, dict)]
+        events = [e for e in result.get("events") or [] if isinstance(e, dict)]
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM targets WHERE segment_id = ?", (segment_id,))
+            self.connection.execute("DELETE FROM events WHERE segment_id = ?", (segment_id,))
+            # The segment row keeps the result without its lists (null placeholders mark which lists it had)
+            segment_data = {k: (None if k in ("targets", "events") else v) for k, v in result.items()}
+            self.connection.execute(
+                "INSERT OR REPLACE INTO segments VALUES (?, ?)", (segment_id, _dumps(segment_data)))
+            self.connection.executemany(
+                "INSERT INTO targets VALUES (?, ?, ?, ?, ?, ?)",
+                [(segment_id, position, _text(t.get("id")), _text(t.get("label")), _number(t.get("time")), _dumps(t))
+                 for position, t in enumerate(targets)])
+            self.connection.executemany(
+                "INSERT INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(segment_id, position, _text(e.get("event_id")), _text(e.get("event_type")), _number(e.get("start_time")),
+                  _text(e.get("description")), _number(e.get("particularity")), _dumps(e))
+                 for position, e in enumerate(events)])
+
+    def read_result(self, segment_id) -> Optional[dict]:
+        """One segment's result dict, or None if it is not stored."""
+        return self.read_results([segment_id]).get(int(segment_id))
+
+    def read_results(self, segment_ids: Optional[Iterable] = None) -> Dict[int, dict]:
+        """Result dicts by segment id (all segments by default), loaded with one query per table."""
+        where, params = "", ()
+        if segment_ids is not None:
+            ids = sorted({int(s) for s in segment_ids})
+            if not ids:
+                return {}
+            where = f" WHERE segment_id IN ({', '.join('?' * len(ids))})"
+            params = tuple(ids)
+
+        with self.lock:
+            segments = self.connection.execute(f"SELECT segment_id, data FROM segments{where}", params).fetchall()
+            targets = self.connection.execute(
+                f"SELECT segment_id, data FROM targets{where} ORDER BY segment_id, position", params).fetchall()
+            events = self.connection.execute(
+                f"SELECT segment_id, data FROM events{where} ORDER BY segment_id, position", params).fetchall()
+
+        results = {}
+        for segment_id, data in segments:
+            result = json.loads(data)
+            for key in ("targets", "events"):
+                if key in result:
+                    result[key] = []
+            results[segment_id] = result
+        for segment_id, data in targets:
+            results[segment_id]["targets"].append(json.loads(data))
+        for segment_id, data in events:
+            results[segment_id]["events"].append(json.loads(data))
+        return results
+
+    def get_segment_ids(self) -> List[int]:
+        with self.lock:
+            return [row[0] for row in self.connection.execute("SELECT segment_id FROM segments ORDER BY segment_id")]
+
+    def get_events(self, event_type: Optional[str] = None, start_time: Optional[float] = None,
+                   end_time: Optional[float] = None) -> List[dict]:
+        """Events filtered by type and start time range (using the indexes), with their segment_id."""
+        clauses, params = [], []
+        if event_type is not None:
+            clauses.append("event_type = ?")
+            params.append(event_type)
+        if start_time is not None:
+            clauses.append("start_time >= ?")
+            params.append(start_time)
+        if end_time is not None:
+            clauses.append("start_time <= ?")
+            params.append(end_time)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self.lock:
+            rows = self.connection.execute(
+                f"SELECT segment_id, event_id, event_type, start_time, description, particularity FROM events{where} "
+                f"ORDER BY start_time, segment_id, position", params).fetchall()
+        keys = ("segment_id", "event_id", "event_type", "start_time", "description", "particularity")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def import_directory(self, video_name: str) -> int:
+        """
+        Import {video_name}/segment_analysis/segment_N.json files; unreadable files are reported and skipped.
+
+        :return: Number of segments imported
+        """
+        imported = 0
+        for path in glob.glob(os.path.join(video_name, "segment_analysis", "segment_*.json")):
+            match = re.search(r"segment_(\d+)\.json$", path)
+            if not match:
+                continue
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    result = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Warning: Unable to import {path}: {e}")
+                continue
+            self.write_result(match.group(1), result)
+            imported += 1
+        return imported
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+_stores: Dict[str, AnalysisStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_analysis_store(video_name: str) -> Optional[AnalysisStore]:
+    """The video's store when ANALYSIS_STORE=sqlite (shared per process), else None for the JSON file layout."""
+    if os.getenv("ANALYSIS_STORE", "").lower() != "sqlite":
+        return None
+    key = os.path.abspath(video_name)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = AnalysisStore.for_video(video_name)
+        return _stores[key]
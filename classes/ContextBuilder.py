@@ -0,0 +1,140 @@
+import os
+from typing import Dict, List, Optional, Tuple
+from classes.EventFactory import Event
+from classes.TargetFactory import Target
+
+# Default budget for the previous-segment context (events, targets and summary), in estimated tokens
+DEFAULT_CONTEXT_TOKEN_BUDGET = 1200
+CHARS_PER_TOKEN = 4
+# Share of the budget kept for events when the previous summary alone would take more
+MIN_EVENT_SHARE = 0.5
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN
+
+
+def truncate_to_tokens(text: str, tokens: int) -> str:
+    """Cut text at a word boundary so it fits in `tokens` estimated tokens, marking the cut with "..."."""
+    if estimate_tokens(text) <= tokens:
+        return text
+    limit = tokens * CHARS_PER_TOKEN - 3
+    if limit <= 0:
+        return ""
+    cut = text[:limit]
+    if " " in cut:
+        cut = cut.rsplit(" ", 1)[0]
+    return cut.rstrip() + "..."
+
+
+class ContextBuilder:
+    """
+    Keeps the previous segment's parsed result in memory and renders it as compact prompt context.
+
+    Each event is one line, with the targets it involves as "id:label". Ended events (particularity 0) are left
+    out as before; if the rendering exceeds the token budget, the least particular events are dropped first. The
+    previous summary counts against the same budget but is cut short rather than crowding out the events.
+    """
+
+    def __init__(self, token_budget: Optional[int] = DEFAULT_CONTEXT_TOKEN_BUDGET):
+        self.token_budget = token_budget  # None disables the budget
+        self.segment_id = None
+        self.result = None
+        self.last_stats: Dict[str, int] = {}
+
+    @classmethod
+    def from_env(cls) -> 'ContextBuilder':
+        """Budget from CONTEXT_TOKEN_BUDGET (0 disables it); default DEFAULT_CONTEXT_TOKEN_BUDGET."""
+        budget = os.getenv("CONTEXT_TOKEN_BUDGET")
+        if budget is None:
+            return cls()
+        return cls(int(budget) or None)
+
+    def update(self, segment_id, result: Optional[dict]):
+        """Remember a segment's parsed result as context for the segment after it."""
+        self.segment_id = int(segment_id)
+        self.result = result
+
+    def has_previous(self, segment) -> bool:
+        return self.segment_id is not None and self.segment_id == int(segment.id) - 1
+
+    def build(self, segment, summary_subsection_interval) -> Tuple[str, str]:
+        """
+        Render (previous_event_str, previous_summary) for `segment` from the remembered previous result.
+
+        Statistics of the rendering (tokens, baseline_tokens of the uncompacted str(event) rendering,
+        dropped_events) are left in last_stats.
+        """
+        result = self.result if self.has_previous(segment) else None
+        if not result or "raw_text" in result:
+            self.last_stats = {"tokens": 0, "baseline_tokens": 0, "dropped_events": 0}
+            return "", ""
+
+        previous_summary = ""
+        if int(segment.id) % summary_subsection_interval != 0:
+            # Refresh summary every N segments to keep it locally scoped
+            previous_summary = result.get("summary") or ""
+
+        events = [e for e in result.get("events") or [] if e.get("particularity") != 0]
+        targets = {str(t.get("id")): t for t in result.get("targets") or [] if isinstance(t, dict)}
+
+        kept = list(events)
+        rendered = self._render(kept, targets)
+        budget = None
+        if self.token_budget is not None:
+            # The summary may not take the share reserved for events (or what they need, if less)
+            reserved = min(estimate_tokens(rendered), int(self.token_budget * MIN_EVENT_SHARE))
+            previous_summary = truncate_to_tokens(previous_summary, self.token_budget - reserved)
+            budget = self.token_budget - estimate_tokens(previous_summary)
+        # Drop least particular events first (later ones first among equals) until the rendering fits
+        drop_order = sorted(range(len(events)), key=lambda i: (_particularity(events[i]), -i))
+        while budget is not None and estimate_tokens(rendered) > budget and kept:
+            kept.remove(events[drop_order.pop(0)])
+            rendered = self._render(kept, targets)
+
+        self.last_stats = {
+            "tokens": estimate_tokens(rendered),
+            "baseline_tokens": estimate_tokens(self._render_baseline(events, result)),
+            "dropped_events": len(events) - len(kept),
+        }
+        return rendered, previous_summary
+
+    @staticmethod
+    def _render(events: List[dict], targets: Dict[str, dict]) -> str:
+        lines = []
+        for event in events:
+            participants = []
+            for target_id in event.get("target_ids") or []:
+                target = targets.get(str(target_id))
+                participants.append(f"{target_id}:{target.get('label')}" if target is not None else str(target_id))
+            line = (f"[{event.get('event_id')}] {event.get('event_type')} @{event.get('start_time')} "
+                    f"targets={','.join(participants)}: {event.get('description')}")
+            if event.get("cause") and event.get("cause") != "None":
+                line += f" Cause: {event.get('cause')}"
+            lines.append(line)
+        return "\n".join(lines)
+
+    @staticmethod
+    def _render_baseline(events: List[dict], result: dict) -> str:
+        """The str(event) rendering the factories produce, for the tokens-saved metric."""
+        targets = [
+            Target(id=t.get("id"), label=t.get("label"), features=t.get("features"), time=t.get("time", 0))
+            for t in result.get("targets") or [] if isinstance(t, dict)
+        ]
+        rendered = []
+        for e in events:
+            event = Event(event_id=e.get("event_id"), event_type=e.get("event_type"), start_time=e.get("start_time"),
+                          current_time=0.0, target_ids=e.get("target_ids"), description=e.get("description"),
+                          particularity=e.get("particularity"), cause=e.get("cause"), cause_event_id=e.get("cause_event_id"),
+                          parent_segment_id=None)
+            # EventFactory.create_event matches targets by label
+            event.set_targets([t for t in targets if t.get_label() in (e.get("target_ids") or [])])
+            rendered.append(str(event) + "\n")
+        return "\n".join(rendered)
+
+
+def _particularity(event: dict) -> float:
+    try:
+        return float(event.get("particularity") or 0)
+    except (TypeError, ValueError):
+        return 0.0
@@ -5,6 +5,9 @@ import uuid
 
 
 class Event:
+    __slots__ = ("id", "event_type", "start_time", "current_time", "target_ids", "targets", "description",
+                 "particularity", "cause", "cause_event_id", "parent_segment_id")
+
     def __init__(self,
                  event_id: str,
                  event_type: str,
@@ -65,11 +68,12 @@ class Event:
 
     def remove_target(self, target_id: str):
         self.targets = [t for t in self.targets if t.get_id() != target_id]
-        self.target_ids.remove(target_id)
+        self.target_ids = [i for i in self.target_ids if i != target_id]
 
     @staticmethod
     def find_targets(target_ids: List[str], all_targets: List[Target]) -> List[Target]:
-        return [target for target in all_targets if target.get_id() in target_ids]
+        wanted = set(target_ids)
+        return [target for target in all_targets if target.get_id() in wanted]
 
     def update_targets(self, all_targets: List[Target]):
         self.targets = self.find_targets(self.target_ids, all_targets)
@@ -113,7 +117,8 @@ class EventFactory:
         )
 
         # Find matching targets from the provided target_list
-        matching_targets = [target for target in target_list if target.get_label() in target_ids]
+        target_ids_set = set(target_ids)
+        matching_targets = [target for target in target_list if target.get_label() in target_ids_set]
 
         # Extra handling (to be improved): set reverse link
         for target in matching_targets:
@@ -126,7 +131,16 @@ class EventFactory:
     def create_events_from_json(self, json_file_path: str, segment_id: str, target_list: List[Target] = None) -> List[Event]:
         with open(json_file_path, 'r') as file:
             data = json.load(file)
-            events_data = data.get("events", [])
+        return self.create_events_from_data(data, segment_id, target_list)
+
+    def create_events_from_data(self, data: dict, segment_id: str, target_list: List[Target] = None) -> List[Event]:
+        """Create Event instances from an already parsed segment analysis dict."""
+        events_data = data.get("events", [])
+
+        # Positions of each target id in target_list, so matching an event is a few lookups instead of a scan
+        target_positions: Dict[Any, List[int]] = {}
+        for position, target in enumerate(target_list or []):
+            target_positions.setdefault(target.get_id(), []).append(position)
 
         events = []
 
@@ -157,7 +171,8 @@ class EventFactory:
 
             # Find matching targets from the provided target_list
             if target_list is not None:
-                matching_targets = [target for target in target_list if target.get_id() in event_data['target_ids']]
+                positions = sorted(p for target_id in set(event_data['target_ids']) for p in target_positions.get(target_id, ()))
+                matching_targets = [target_list[p] for p in positions]
                 # Extra handling (to be improved): set reverse link
                 for target in matching_targets:
                     target.parent_event_id = event_data['event_id']
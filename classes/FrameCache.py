@@ -0,0 +1,97 @@
+from typing import Dict, Optional
+from collections import OrderedDict, deque
+from base64 import b64encode
+import hashlib
+import os
+import cv2
+import numpy as np
+from classes.FramePreprocessor import FramePreprocessor
+
+
+def perceptual_hash(image_bytes: bytes) -> Optional[int]:
+    """64-bit difference hash (dHash) of an encoded image, robust to recompression and small noise."""
+    image = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if image is None:
+        return None
+    small = cv2.resize(image, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+class FrameCache:
+    """Content-addressed store of base64-encoded frames shared by overlapping segments."""
+
+    def __init__(self, phash_threshold: Optional[int] = None, phash_window: int = 8,
+                 preprocessor: Optional[FramePreprocessor] = None, max_bytes: Optional[int] = None):
+        self.frames: Dict[str, str] = OrderedDict()  # content digest -> base64 string, least recently used first
+        self.path_index: Dict[str, str] = {}  # image path -> content digest
+        self.phash_threshold = phash_threshold  # max Hamming distance for near-duplicates, None disables
+        self.recent_hashes = deque(maxlen=phash_window)  # (phash, digest) of the latest distinct frames
+        self.preprocessor = preprocessor  # applied once per distinct frame before encoding
+        self.max_bytes = max_bytes  # evict least recently used frames above this size, None keeps everything
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.near_duplicates = 0
+
+    def add_path(self, image_path: str) -> Optional[str]:
+        """Return the shared base64 string for an image file, reading and encoding it at most once."""
+        digest = self.path_index.get(image_path)
+        if digest in self.frames:
+            self.hits += 1
+            self.frames.move_to_end(digest)
+            return self.frames[digest]
+
+        if not os.path.exists(image_path):
+            print(f"Warning: Image file not found at {image_path}")
+            return None
+
+        with open(image_path, "rb") as image_file:
+            data = image_file.read()
+        digest, encoded = self._add(data)
+        self.path_index[image_path] = digest
+        return encoded
+
+    def add_bytes(self, image_bytes: bytes) -> str:
+        """Return the shared base64 string for an encoded image buffer."""
+        return self._add(image_bytes)[1]
+
+    def _add(self, data: bytes):
+        digest = hashlib.sha1(data).hexdigest()
+        if digest in self.frames:
+            self.hits += 1
+            self.frames.move_to_end(digest)
+            return digest, self.frames[digest]
+
+        self.misses += 1
+        if self.phash_threshold is not None:
+            phash = perceptual_hash(data)
+            if phash is not None:
+                for recent_hash, recent_digest in self.recent_hashes:
+                    if recent_digest in self.frames and bin(phash ^ recent_hash).count("1") <= self.phash_threshold:
+                        # Alias the near-duplicate to the frame already stored; no new string is kept
+                        self.near_duplicates += 1
+                        return digest, self._store(digest, self.frames[recent_digest])
+                self.recent_hashes.append((phash, digest))
+
+        if self.preprocessor is not None:
+            data = self.preprocessor.process(data)
+        return digest, self._store(digest, b64encode(data).decode('utf-8'))
+
+    def _store(self, digest: str, encoded: str) -> str:
+        self.frames[digest] = encoded
+        self.total_bytes += len(encoded)
+        while self.max_bytes is not None and self.total_bytes > self.max_bytes and len(self.frames) > 1:
+            _, evicted = self.frames.popitem(last=False)
+            self.total_bytes -= len(evicted)
+        return encoded
+
+    def get_stats(self) -> dict:
+        return {
+            "frames": len(self.frames),
+            "bytes": self.total_bytes,
+            "unique_frames": len({id(v) for v in self.frames.values()}),
+            "hits": self.hits,
+            "misses": self.misses,
+            "near_duplicates": self.near_duplicates,
+        }
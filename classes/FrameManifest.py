@@ -0,0 +1,45 @@
+from typing import Iterable, List, Tuple
+import sqlite3
+
+# Conventional location: {video_name}/frames_manifest.db, next to the frames directory
+DEFAULT_MANIFEST_NAME = "frames_manifest.db"
+
+FrameRecord = Tuple[int, float, str, str]  # (frame_number, pts_seconds, path, sha1)
+
+
+class FrameManifest:
+    """SQLite index of extracted frames: frame number, presentation timestamp, path and content hash."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS frames ("
+            "frame_number INTEGER PRIMARY KEY, pts REAL NOT NULL, path TEXT NOT NULL, hash TEXT)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_frames_pts ON frames (pts)")
+
+    def add_frames(self, records: Iterable[FrameRecord]):
+        with self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO frames VALUES (?, ?, ?, ?)", records)
+
+    def clear(self):
+        with self.connection:
+            self.connection.execute("DELETE FROM frames")
+
+    def get_frames(self) -> List[FrameRecord]:
+        """All frames ordered by frame number."""
+        return self.connection.execute("SELECT frame_number, pts, path, hash FROM frames ORDER BY frame_number").fetchall()
+
+    def get_frames_between(self, start_time: float, end_time: float) -> List[FrameRecord]:
+        """Frames with start_time <= pts <= end_time, using the pts index."""
+        return self.connection.execute(
+            "SELECT frame_number, pts, path, hash FROM frames WHERE pts BETWEEN ? AND ? ORDER BY pts",
+            (start_time, end_time),
+        ).fetchall()
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM frames").fetchone()[0]
+
+    def close(self):
+        self.connection.close()
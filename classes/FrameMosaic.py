@@ -0,0 +1,136 @@
+from typing import List, Optional, Sequence
+from base64 import b64decode, b64encode
+import hashlib
+import math
+import os
+import cv2
+import numpy as np
+
+# Height of the timestamp band at the top of each tile, relative to the tile width
+LABEL_BAND_RATIO = 0.07
+
+
+class FrameMosaic:
+    """Pack a segment's frames into timestamp-labelled grid mosaics so a request carries a few images instead of 20."""
+
+    def __init__(self, columns: int = 2, rows: int = 2, tile_width: int = 640, jpeg_quality: int = 85,
+                 cache_dir: Optional[str] = None):
+        self.columns = columns
+        self.rows = rows
+        self.tile_width = tile_width  # width of one frame in the mosaic; height follows the first frame's aspect ratio
+        self.jpeg_quality = jpeg_quality
+        self.cache_dir = cache_dir  # default: "_mosaics" next to the segment's frame files; in-memory frames are not cached
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def frames_per_mosaic(self) -> int:
+        return self.columns * self.rows
+
+    def build(self, frames: Sequence[np.ndarray], labels: Sequence[str]) -> np.ndarray:
+        """
+        Tile decoded BGR frames row by row into one image, each with its label in a band at the top.
+
+        Unused cells of the last mosaic stay black.
+        """
+        height, width = frames[0].shape[:2]
+        tile_height = max(1, round(self.tile_width * height / width))
+        rows = math.ceil(len(frames) / self.columns)
+
+        tiles = np.zeros((rows * self.columns, tile_height, self.tile_width, 3), dtype=np.uint8)
+        for i, frame in enumerate(frames):
+            if frame.ndim == 2:
+                frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+            tiles[i] = cv2.resize(frame, (self.tile_width, tile_height), interpolation=cv2.INTER_AREA)
+
+        # Darken the label band of every tile at once so white text stays readable on any scene
+        band = max(12, int(self.tile_width * LABEL_BAND_RATIO))
+        tiles[:len(frames), :band] //= 3
+        scale = band / 30
+        for i, label in enumerate(labels):
+            cv2.putText(tiles[i], label, (4, band - max(3, band // 5)), cv2.FONT_HERSHEY_SIMPLEX, scale,
+                        (255, 255, 255), max(1, round(scale * 2)), cv2.LINE_AA)
+
+        # (rows * columns, h, w, 3) -> (rows * h, columns * w, 3)
+        grid = tiles.reshape(rows, self.columns, tile_height, self.tile_width, 3).transpose(0, 2, 1, 3, 4)
+        return grid.reshape(rows * tile_height, self.columns * self.tile_width, 3)
+
+    def compose(self, images: List[str], times: Sequence[float], cache_dir: Optional[str] = None) -> List[str]:
+        """
+        Base64 JPEG mosaics for base64 frames, frames_per_mosaic frames per mosaic in temporal order.
+
+        :param images: Base64-encoded frames
+        :param times: Timestamp of each frame in seconds, drawn on its tile
+        :param cache_dir: Directory for cached mosaics if self.cache_dir is not set (None disables caching)
+        """
+        mosaics = []
+        cache_dir = self.cache_dir or cache_dir
+        for start in range(0, len(images), self.frames_per_mosaic):
+            chunk = images[start:start + self.frames_per_mosaic]
+            labels = [f"t={t:.1f}s" for t in times[start:start + self.frames_per_mosaic]]
+            path = None
+            if cache_dir:
+                path = os.path.join(cache_dir, f"{self._cache_key(chunk, labels)}.jpg")
+                if os.path.exists(path):
+                    self.hits += 1
+                    with open(path, "rb") as f:
+                        mosaics.append(b64encode(f.read()).decode('utf-8'))
+                    continue
+
+            self.misses += 1
+            frames = [cv2.imdecode(np.frombuffer(b64decode(image), dtype=np.uint8), cv2.IMREAD_COLOR) for image in chunk]
+            decoded = [(frame, label) for frame, label in zip(frames, labels) if frame is not None]
+            if not decoded:
+                # Nothing decodable (e.g. placeholder bytes): pass the frames through unchanged
+                mosaics.extend(chunk)
+                continue
+            success, buffer = cv2.imencode(".jpg", self.build(*zip(*decoded)),
+                                           [int(cv2.IMWRITE_JPEG_QUALITY), self.jpeg_quality])
+            if not success:
+                mosaics.extend(chunk)
+                continue
+            data = buffer.tobytes()
+            if path is not None:
+                os.makedirs(cache_dir, exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            mosaics.append(b64encode(data).decode('utf-8'))
+        return mosaics
+
+    def compose_segment(self, segment) -> List[str]:
+        """Mosaics of a segment's loaded images, cached in a "_mosaics" folder next to its frame files."""
+        cache_dir = os.path.join(os.path.dirname(segment.image_paths[0]), "_mosaics") if segment.image_paths else None
+        return self.compose(segment.images, segment_frame_times(segment), cache_dir=cache_dir)
+
+    def _cache_key(self, images: List[str], labels: List[str]) -> str:
+        digest = hashlib.sha1(f"{self.columns}x{self.rows}|{self.tile_width}|{self.jpeg_quality}".encode("utf-8"))
+        for image, label in zip(images, labels):
+            digest.update(hashlib.sha1(image.encode('ascii')).digest())
+            digest.update(label.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get_stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+def segment_frame_times(segment) -> List[float]:
+    """Timestamps of a segment's loaded images: the kept frame times if known, else evenly spaced over the segment."""
+    count = len(segment.images)
+    if len(segment.image_times) == count:
+        return list(segment.image_times)
+    if count <= 1:
+        return [float(segment.start_time)] * count
+    step = (segment.end_time - segment.start_time) / (count - 1)
+    return [segment.start_time + i * step for i in range(count)]
+
+
+def describe_mosaics(segment) -> str:
+    """Prompt note explaining the mosaic layout when a segment's frames are sent as mosaics."""
+    mosaic = getattr(segment, "mosaic", None)
+    if mosaic is None:
+        return ""
+    return (f"\n— Frame layout —\n"
+            f"Frames are tiled into mosaics of up to {mosaic.frames_per_mosaic} frames ({mosaic.columns} columns x {mosaic.rows} rows), "
+            f"in temporal order left to right, top to bottom. Each tile is labelled with its timestamp.\n")
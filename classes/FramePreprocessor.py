@@ -0,0 +1,69 @@
+from typing import List, Optional
+from collections import OrderedDict
+from base64 import b64decode, b64encode
+import hashlib
+import cv2
+import numpy as np
+
+
+class FramePreprocessor:
+    """Downscale and recompress frames before they are base64-encoded for the model."""
+
+    def __init__(self, max_width: Optional[int] = 1280, max_height: Optional[int] = 720, jpeg_quality: int = 80,
+                 segment_byte_budget: Optional[int] = None, min_quality: int = 30, quality_step: int = 15,
+                 max_cached: int = 1024):
+        self.max_width = max_width  # frames wider than this are downscaled, keeping aspect ratio
+        self.max_height = max_height  # frames taller than this are downscaled, keeping aspect ratio
+        self.jpeg_quality = jpeg_quality  # quality of the recompressed frames
+        self.segment_byte_budget = segment_byte_budget  # max base64 bytes of all images in one request
+        self.min_quality = min_quality  # lowest quality used when fitting a segment into its budget
+        self.quality_step = quality_step
+        self.max_cached = max_cached
+        self._requantized = OrderedDict()  # (frame digest, quality) -> base64 string
+
+    def process(self, image_bytes: bytes, quality: Optional[int] = None) -> bytes:
+        """Downscale an encoded image to the target resolution and re-encode it as JPEG."""
+        image = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            return image_bytes
+
+        height, width = image.shape[:2]
+        scale = min(1.0,
+                    self.max_width / width if self.max_width else 1.0,
+                    self.max_height / height if self.max_height else 1.0)
+        if scale < 1.0:
+            image = cv2.resize(image, (max(1, int(width * scale)), max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+
+        success, buffer = cv2.imencode(".jpg", image, [int(cv2.IMWRITE_JPEG_QUALITY), quality or self.jpeg_quality])
+        return buffer.tobytes() if success else image_bytes
+
+    def fit_to_budget(self, images: List[str]) -> List[str]:
+        """
+        Lower JPEG quality step by step until a segment's base64 images fit the byte budget.
+
+        Requantized frames are cached, so a frame shared by overlapping segments is recompressed once per quality.
+        """
+        if self.segment_byte_budget is None or sum(len(i) for i in images) <= self.segment_byte_budget:
+            return images
+
+        fitted = images
+        quality = self.jpeg_quality
+        while quality > self.min_quality:
+            quality = max(self.min_quality, quality - self.quality_step)
+            fitted = [self._requantize(image, quality) for image in images]
+            if sum(len(i) for i in fitted) <= self.segment_byte_budget:
+                break
+
+        return fitted
+
+    def _requantize(self, image: str, quality: int) -> str:
+        key = (hashlib.sha1(image.encode('ascii')).hexdigest(), quality)
+        if key in self._requantized:
+            self._requantized.move_to_end(key)
+            return self._requantized[key]
+
+        encoded = b64encode(self.process(b64decode(image), quality=quality)).decode('utf-8')
+        self._requantized[key] = encoded
+        if len(self._requantized) > self.max_cached:
+            self._requantized.popitem(last=False)
+        return encoded
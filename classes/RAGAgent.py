@@ -6,6 +6,7 @@ from typing import List
 from classes.Segment import Segment
 from classes.StoryTree import StoryPool
 from utils.ai import get_chat_model
+from utils.metrics import MetricsCallbackHandler
 import logging
 import os
 
@@ -53,6 +54,7 @@ class Agent:
         self.database.build_by_vectorstore(vectorstore)
         self.segments = segments
         self.story_pool = story_pool
+        self.registry = story_pool.registry
 
         self.target_factory = target_factory
         self.event_factory = event_factory
@@ -126,11 +128,9 @@ class Agent:
                 parent_event_id = r.metadata['parent_event_id']
                 segment_id = r.metadata['segment_id']
                 if parent_event_id != "-1":
-                    events = self.segments[segment_id - 1].events
-                    for ev in events:
-                        if ev.id == parent_event_id:
-                            text.append(f"Target's event: {str(ev)}\n")
-                            break
+                    ev = self.registry.get_event(segment_id, parent_event_id)
+                    if ev is not None:
+                        text.append(f"Target's event: {str(ev)}\n")
                 out.append("\n".join(text))
             return "\n".join(out)
 
@@ -161,5 +161,6 @@ class Agent:
                 ("user", user_prompt)
             ]
         }
-        response = self.react_agent.invoke(messages)
+        # Record every model call of the agent run (tokens, latency) under the "agent" stage
+        response = self.react_agent.invoke(messages, config={"callbacks": [MetricsCallbackHandler(stage="agent")]})
         return response
@@ -0,0 +1,125 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+from collections import defaultdict
+from classes.EventFactory import Event
+from classes.TargetFactory import Target
+
+
+def _key(segment_id, item_id) -> Tuple[str, str]:
+    # Ids come from model output as str or int; index both forms under the same key
+    return str(segment_id), str(item_id)
+
+
+class Registry:
+    """
+    Per-video index of targets and events in hash maps.
+
+    Targets and events are keyed by (segment_id, id), since the model reuses target and event ids across
+    segments. Secondary indexes map segments, labels and event types to their members, and each target to the
+    events it takes part in.
+    """
+
+    def __init__(self):
+        self.targets: Dict[Tuple[str, str], Target] = {}
+        self.targets_by_segment: Dict[str, Dict[str, Target]] = defaultdict(dict)
+        self.targets_by_label: Dict[str, Dict[Tuple[str, str], Target]] = defaultdict(dict)
+        self.events: Dict[Tuple[str, str], Event] = {}
+        self.events_by_segment: Dict[str, List[Event]] = defaultdict(list)
+        self.events_by_type: Dict[str, Dict[Tuple[str, str], Event]] = defaultdict(dict)
+        self.target_events: Dict[Tuple[str, str], List[Event]] = defaultdict(list)  # reverse map target -> events
+
+    @classmethod
+    def from_segments(cls, segments: Iterable) -> 'Registry':
+        registry = cls()
+        for segment in segments:
+            registry.add_segment(segment)
+        return registry
+
+    def add_segment(self, segment):
+        """Index a filled segment's targets and events (re-adding a segment replaces its entries)."""
+        self.remove_segment(segment.id)
+        self.add_targets(segment.id, segment.targets)
+        for event in segment.events:
+            self.add_event(event, segment_id=segment.id)
+
+    def add_targets(self, segment_id, targets: Iterable[Target]):
+        segment_targets = self.targets_by_segment[str(segment_id)]
+        for target in targets:
+            key = _key(segment_id, target.get_id())
+            if key in self.targets:
+                continue  # duplicate id within a segment: the first one wins, as in the factories' matching
+            self.targets[key] = target
+            segment_targets[key[1]] = target
+            self.targets_by_label[target.get_label()][key] = target
+
+    def add_event(self, event: Event, segment_id=None):
+        """Index an event and link it to its targets by id (its targets list is left as the factory built it)."""
+        segment_id = event.parent_segment_id if segment_id is None else segment_id
+        self.events[_key(segment_id, event.id)] = event
+        self.events_by_segment[str(segment_id)].append(event)
+        self.events_by_type[event.event_type][_key(segment_id, event.id)] = event
+        for target_id in set(str(t) for t in event.target_ids or []):
+            key = _key(segment_id, target_id)
+            if key in self.targets:
+                self.target_events[key].append(event)
+
+    def remove_segment(self, segment_id):
+        segment_id = str(segment_id)
+        for target_id, target in self.targets_by_segment.pop(segment_id, {}).items():
+            del self.targets[(segment_id, target_id)]
+            self.target_events.pop((segment_id, target_id), None)
+            self.targets_by_label[target.get_label()].pop((segment_id, target_id), None)
+        for event in self.events_by_segment.pop(segment_id, []):
+            self.events.pop((segment_id, str(event.id)), None)
+            self.events_by_type[event.event_type].pop((segment_id, str(event.id)), None)
+
+    def remove_target(self, segment_id, target_id):
+        """Drop a target from the indexes and from the events that reference it."""
+        key = _key(segment_id, target_id)
+        target = self.targets.pop(key, None)
+        if target is None:
+            return
+        del self.targets_by_segment[key[0]][key[1]]
+        self.targets_by_label[target.get_label()].pop(key, None)
+        for event in self.target_events.pop(key, []):
+            event.targets = [t for t in event.targets if t is not target]
+            event.target_ids = [i for i in event.target_ids if str(i) != key[1]]
+
+    def has_segment(self, segment_id) -> bool:
+        segment_id = str(segment_id)
+        return segment_id in self.targets_by_segment or segment_id in self.events_by_segment
+
+    def get_target(self, segment_id, target_id) -> Optional[Target]:
+        return self.targets.get(_key(segment_id, target_id))
+
+    def get_targets(self, segment_id) -> List[Target]:
+        return list(self.targets_by_segment.get(str(segment_id), {}).values())
+
+    def get_targets_by_label(self, label: str) -> List[Target]:
+        return list(self.targets_by_label.get(label, {}).values())
+
+    def get_event(self, segment_id, event_id) -> Optional[Event]:
+        return self.events.get(_key(segment_id, event_id))
+
+    def get_events(self, segment_id) -> List[Event]:
+        return list(self.events_by_segment.get(str(segment_id), []))
+
+    def get_events_by_type(self, event_type: str) -> List[Event]:
+        return list(self.events_by_type.get(event_type, {}).values())
+
+    def get_events_for_target(self, segment_id, target_id) -> List[Event]:
+        """Events of the segment the target takes part in."""
+        return list(self.target_events.get(_key(segment_id, target_id), []))
+
+    def get_event_targets(self, event: Event, segment_id=None) -> List[Target]:
+        """The event's targets looked up by id in its segment."""
+        segment_id = event.parent_segment_id if segment_id is None else segment_id
+        segment_targets = self.targets_by_segment.get(str(segment_id), {})
+        found = (segment_targets.get(str(t)) for t in dict.fromkeys(event.target_ids or []))
+        return [target for target in found if target is not None]
+
+    def get_stats(self) -> dict:
+        return {
+            "segments": len(self.targets_by_segment.keys() | self.events_by_segment.keys()),
+            "targets": len(self.targets),
+            "events": len(self.events),
+        }
@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+from classes.AnalysisStore import get_analysis_store
+
+COMPLETED = "completed"
+FAILED = "failed"
+RAW_TEXT = "raw_text"  # response was stored as {"raw_text": ...} because it did not parse as JSON
+
+
+class RunJournal:
+    """
+    Append-only JSONL journal of per-segment analysis outcomes, used to resume interrupted runs.
+
+    Each line records a segment id, status and the fingerprint of the inputs it was analyzed with; the last
+    line for a segment wins. A segment is skipped on resume only if it completed with the same fingerprint
+    and its result file still parses.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, dict] = {}  # segment id -> last journal entry
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # line torn by a crash mid-write
+                    self.entries[str(entry["segment_id"])] = entry
+
+    @classmethod
+    def for_video(cls, video_name: str) -> 'RunJournal':
+        output_dir = f"{video_name}/segment_analysis"
+        os.makedirs(output_dir, exist_ok=True)
+        return cls(os.path.join(output_dir, "_journal.jsonl"))
+
+    @staticmethod
+    def fingerprint(segment, *inputs) -> str:
+        """
+        Hash of everything a segment's analysis depends on.
+
+        Frames are identified by path, size and modification time (or content for in-memory frames),
+        so fingerprinting does not load images.
+
+        :param segment: Segment being analyzed
+        :param inputs: Other inputs (prompts, configs, detail level, previous context); must be str()-able
+        """
+        digest = hashlib.sha256()
+        digest.update(f"{segment.id}|{segment.start_time}|{segment.end_time}".encode("utf-8"))
+        if segment.image_paths:
+            for path in segment.image_paths:
+                try:
+                    stat = os.stat(path)
+                    digest.update(f"|{path}|{stat.st_size}|{stat.st_mtime_ns}".encode("utf-8"))
+                except OSError:
+                    digest.update(f"|{path}|missing".encode("utf-8"))
+        else:
+            for image in segment.images:
+                digest.update(image.encode("utf-8"))
+        for value in inputs:
+            digest.update(b"\x00" + str(value).encode("utf-8"))
+        return digest.hexdigest()
+
+    def record(self, segment_id, status: str, fingerprint: str, error: Optional[str] = None):
+        entry = {"segment_id": str(segment_id), "status": status, "fingerprint": fingerprint, "time": time.time()}
+        if error is not None:
+            entry["error"] = error
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self.lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+            self.entries[str(segment_id)] = entry
+
+    def get_status(self, segment_id) -> Optional[str]:
+        entry = self.entries.get(str(segment_id))
+        return entry["status"] if entry else None
+
+    def is_done(self, segment_id, fingerprint: str, video_name: str) -> bool:
+        """Whether the segment completed with these inputs and its result file is still valid."""
+        entry = self.entries.get(str(segment_id))
+        if not entry or entry["status"] != COMPLETED or entry["fingerprint"] != fingerprint:
+            return False
+        store = get_analysis_store(video_name)
+        result = store.read_result(segment_id) if store is not None else None
+        if result is None:
+            result_path = os.path.join(f"{video_name}/segment_analysis", f"segment_{segment_id}.json")
+            try:
+                with open(result_path, "r", encoding="utf-8") as f:
+                    result = json.load(f)
+            except (OSError, ValueError):
+                return False
+        return isinstance(result, dict) and "raw_text" not in result
+
+    def summary(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for entry in self.entries.values():
+            counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+        return counts
@@ -1,35 +1,157 @@
 from typing import List, Optional
+from collections import OrderedDict
 from classes.TargetFactory import Target
 from classes.EventFactory import Event
+from classes.FrameCache import FrameCache
+from classes.FrameMosaic import FrameMosaic
 from base64 import b64encode
 import os
+import threading
+
+
+class ImageMemoryBudget:
+    """Caps the base64 bytes held by loaded segments; the least recently used segments are released first."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.loaded = OrderedDict()  # segment -> bytes held
+        self.lock = threading.Lock()
+
+    def attach(self, segments: List['Segment']):
+        """Put a whole segment list under this budget."""
+        for segment in segments:
+            segment.memory_budget = self
+
+    def register(self, segment: 'Segment'):
+        size = sum(len(image) for image in segment.images)
+        with self.lock:
+            self.total_bytes += size - self.loaded.pop(segment, 0)
+            self.loaded[segment] = size
+            evicted = []
+            while self.total_bytes > self.max_bytes and len(self.loaded) > 1:
+                oldest, oldest_size = self.loaded.popitem(last=False)
+                self.total_bytes -= oldest_size
+                evicted.append(oldest)
+        for oldest in evicted:
+            oldest._drop_images()
+
+    def touch(self, segment: 'Segment'):
+        with self.lock:
+            if segment in self.loaded:
+                self.loaded.move_to_end(segment)
+
+    def unregister(self, segment: 'Segment'):
+        with self.lock:
+            self.total_bytes -= self.loaded.pop(segment, 0)
 
 
 class Segment:
-    def __init__(self, segment_id: str, start_time: float, end_time: float, image_paths: Optional[List[str]] = None):
+    __slots__ = ("id", "start_time", "end_time", "image_paths", "images", "images_loaded", "image_times",
+                 "dropped_frame_times", "targets", "events", "summary", "frame_cache", "memory_budget", "mosaic",
+                 "mosaics")
+
+    def __init__(self, segment_id: str, start_time: float, end_time: float, image_paths: Optional[List[str]] = None,
+                 frame_cache: Optional[FrameCache] = None, memory_budget: Optional[ImageMemoryBudget] = None,
+                 mosaic: Optional[FrameMosaic] = None):
         self.id = segment_id
         self.start_time = start_time
         self.end_time = end_time
-        self.images: List[str] = []
+        self.image_paths: List[str] = []  # image files, loaded on demand by get_images()
+        self.images: List[str] = []  # base64 images, empty while released
+        self.images_loaded = False
+        self.image_times: List[float] = []  # frame times, aligned with image_paths (or images for in-memory frames)
+        self.dropped_frame_times: List[float] = []  # frames dropped as near-identical (frame selection or cache collapse)
         self.targets: List[Target] = []
         self.events: List[Event] = []
         self.summary: str = ""
+        self.frame_cache = frame_cache  # shared encoded frames; overlapping segments reference the same strings
+        self.memory_budget = memory_budget  # shared cap on loaded image bytes across a segment list
+        self.mosaic = mosaic  # if set, get_images() returns the frames tiled into timestamp-labelled mosaics
+        self.mosaics: Optional[List[str]] = None  # composed mosaics, kept until the images change or are released
 
         if image_paths:
             for path in image_paths:
                 self.add_image(path)
 
-    def add_image(self, image_path: str):
+    def add_image(self, image_path: str, time: Optional[float] = None):
+        """Register an image file (taken at `time`); it is read and encoded when get_images() is called."""
         if not os.path.exists(image_path):
             print(f"Warning: Image file not found at {image_path}")
             return
 
+        if self.images_loaded:
+            self.mosaics = None
+            loaded = self._load_image(image_path)
+            if not loaded:
+                if loaded is False and time is not None:
+                    self.dropped_frame_times.append(time)
+                return
+        self.image_paths.append(image_path)
+        if time is not None:
+            self.image_times.append(time)
+
+    def _load_image(self, image_path: str) -> Optional[bool]:
+        """Append an image file's encoding: True if appended, False if collapsed into the previous image, None on failure."""
+        if self.frame_cache is not None:
+            return self._append_cached(self.frame_cache.add_path(image_path))
+
         try:
             with open(image_path, "rb") as image_file:
                 encoded_string = b64encode(image_file.read()).decode('utf-8')
                 self.images.append(encoded_string)
+            return True
         except Exception as e:
             print(f"Error adding image {image_path}: {str(e)}")
+            return None
+
+    def _load_paths(self):
+        # Frames that were collapsed or failed to load are removed with their times, so image_times stays aligned
+        # with images (and reloads after release see the same frames); collapsed ones are recorded as dropped
+        timed = len(self.image_times) == len(self.image_paths)
+        paths, times = [], []
+        for index, path in enumerate(self.image_paths):
+            loaded = self._load_image(path)
+            if loaded:
+                paths.append(path)
+                if timed:
+                    times.append(self.image_times[index])
+            elif loaded is False and timed:
+                self.dropped_frame_times.append(self.image_times[index])
+        if len(paths) != len(self.image_paths):
+            self.image_paths = paths
+            if timed:
+                self.image_times = times
+                self.dropped_frame_times.sort()
+
+    def add_image_bytes(self, image_bytes: bytes, time: Optional[float] = None) -> Optional[bool]:
+        """
+        Add an already encoded image buffer (e.g. a JPEG from ExtractFrames.iter_frames), taken at `time`.
+
+        :return: True if added, False if the frame cache collapsed it into the previous image (its time is then
+            recorded in dropped_frame_times), None if it could not be added
+        """
+        self.mosaics = None
+        if self.frame_cache is not None:
+            added = self._append_cached(self.frame_cache.add_bytes(image_bytes))
+        else:
+            self.images.append(b64encode(image_bytes).decode('utf-8'))
+            added = True
+        if time is not None:
+            if added:
+                self.image_times.append(time)
+            elif added is False:
+                self.dropped_frame_times.append(time)
+        return added
+
+    def _append_cached(self, encoded: Optional[str]) -> Optional[bool]:
+        # The cache maps duplicates and near-duplicates to the same string; collapse consecutive repeats
+        if encoded is None:
+            return None
+        if self.images and self.images[-1] is encoded:
+            return False
+        self.images.append(encoded)
+        return True
 
     def set_targets(self, targets: List[Target]):
         self.targets = targets
@@ -41,11 +163,39 @@ class Segment:
         self.summary = summary
 
     def get_images(self):
-        return self.images
+        if self.image_paths and not self.images_loaded:
+            self._load_paths()
+            self.images_loaded = True
+            if self.memory_budget is not None:
+                self.memory_budget.register(self)
+        elif self.memory_budget is not None:
+            self.memory_budget.touch(self)
+
+        images = self.images
+        if self.mosaic is not None:
+            if self.mosaics is None:
+                self.mosaics = self.mosaic.compose_segment(self)
+            images = self.mosaics
+        if self.frame_cache is not None and self.frame_cache.preprocessor is not None:
+            return self.frame_cache.preprocessor.fit_to_budget(images)
+        return images
+
+    def release_images(self):
+        """Drop composed mosaics and loaded images that can be reloaded from image_paths; in-memory images are kept."""
+        if self.memory_budget is not None:
+            self.memory_budget.unregister(self)
+        self.mosaics = None
+        self._drop_images()
+
+    def _drop_images(self):
+        if self.image_paths:
+            self.mosaics = None
+            self.images = []
+            self.images_loaded = False
 
     def __str__(self):
         return (f"Segment(id={self.id}, start={self.start_time}, end={self.end_time}, "
-                f"images_count={len(self.images)}, "
+                f"images_count={len(self.images) or len(self.image_paths)}, "
                 f"targets=[{', '.join(str(t) for t in self.targets)}], "
                 f"events=[{', '.join(str(e) for e in self.events)}], "
                 f"summary='{self.summary}')")
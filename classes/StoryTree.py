@@ -1,89 +1,115 @@
 from typing import List, Optional, Dict
 from classes.EventFactory import Event
 from classes.Segment import Segment
+from classes.Registry import Registry
 from collections import defaultdict
 from utils.ai import get_openai_client
+from utils.cache import cached_response
+from utils.metrics import get_metrics, tagged
+import time
 
 SYSTEM_PROMPT = '''
 You are a storyline summarizer. Your task is to compress the provided storyline into 2–3 concise sentences capturing all the main points. Keep the summary under 50 words.
 '''
 
 class StoryNode:
+    __slots__ = ("event", "next", "side", "parent", "height", "cumulative_particularity", "root_summary")
+
     def __init__(self, event: Event, next: Optional['StoryNode'] = None, side: Optional[List['StoryNode']] = None):
         self.event = event
         self.next = next
         self.side = side if side is not None else []
+        self.parent: Optional['StoryNode'] = None  # node this one continues (as next or side branch)
         self.height = 1
         self.cumulative_particularity = event.particularity
         self.root_summary = ""
 
 class StoryPool:
-    def __init__(self, segments: List[Segment]):
+    def __init__(self, segments: List[Segment], registry: Optional[Registry] = None):
         self.events: Dict[int, List[Event]] = defaultdict(list)
         self.roots: Dict[int, List[StoryNode]] = {}
-
-        # Initialize from segment events
-        for segment in segments:
-            self.events[segment.id] = segment.events
+        # Nodes of the last appended segment by event id: the events the next segment's cause_event_id can refer to
+        self.ongoing_nodes: Dict[str, StoryNode] = {}
+        # Target/event index shared with the RAG agent (built from the segments if fill_segments did not fill one)
+        self.registry = registry if registry is not None else Registry()
 
         # Build storylines
-        self.generate_story_lines()
+        for segment in sorted(segments, key=lambda s: s.id):
+            self._link_segment(segment)
 
-        # Update node properties
+        # Update node properties (one pass over all trees instead of per-node path updates)
         self.update_node_properties()
 
         # Generate summaries
         self.generate_summaries()
 
-    def generate_story_lines(self):
-        ongoing_nodes = []
-
-        for segment_id in sorted(self.events.keys()):
-            current_events = self.events[segment_id]
-
-            # Convert current events into nodes and sort by particularity
-            current_nodes = sorted(
-                [StoryNode(event) for event in current_events],
-                key=lambda node: node.event.particularity,
-                reverse=True
-            )
-
-            if not ongoing_nodes:
-                # If nothing is ongoing, set current events as roots
-                self.roots[segment_id] = current_nodes
-                ongoing_nodes = current_nodes
-                continue
+    def append_segment(self, segment: Segment):
+        """
+        Extend the storylines with the events of the next segment (segments must be appended in id order).
+
+        Each event is linked to the previous segment's event named by its cause_event_id through a dict lookup: the
+        first one becomes its next node, later ones side branches that also start storylines of this segment.
+        Unlinked events become new roots. Heights and cumulative particularity are updated along the path from
+        each new node to its root, and the summaries of those roots are cleared so generate_summaries() refreshes
+        only the storylines that changed.
+        """
+        for node in self._link_segment(segment):
+            self._propagate(node)
+
+    def _link_segment(self, segment: Segment) -> List[StoryNode]:
+        """Add a segment's events as nodes of the storylines and return the nodes linked to a parent."""
+        segment_id = segment.id
+        self.events[segment_id] = segment.events
+        if not self.registry.has_segment(segment_id):
+            self.registry.add_segment(segment)
+
+        # Convert current events into nodes and sort by particularity
+        current_nodes = sorted(
+            [StoryNode(event) for event in segment.events],
+            key=lambda node: node.event.particularity,
+            reverse=True
+        )
 
-            new_ongoing_nodes = []
+        linked_nodes = []
+        if not self.ongoing_nodes:
+            # If nothing is ongoing, set current events as roots
+            self.roots[segment_id] = current_nodes
+        else:
             unmatched_nodes = []
-
             for current_node in current_nodes:
-                matched = False
-                for ongoing_node in ongoing_nodes:
-                    if current_node.event.cause_event_id == ongoing_node.event.id:
-                        matched = True
-                        if not ongoing_node.next:
-                            ongoing_node.next = current_node
-                        else:
-                            ongoing_node.side.append(current_node)
-                            if segment_id not in self.roots:
-                                self.roots[segment_id] = []
-                            if current_node not in self.roots[segment_id]:
-                                self.roots[segment_id].append(current_node)
-                        if current_node not in new_ongoing_nodes:
-                            new_ongoing_nodes.append(current_node)
-
-                if not matched:
+                parent = self.ongoing_nodes.get(current_node.event.cause_event_id)
+                if parent is None:
                     unmatched_nodes.append(current_node)
+                    continue
+                if not parent.next:
+                    parent.next = current_node
+                else:
+                    parent.side.append(current_node)
+                    self.roots.setdefault(segment_id, []).append(current_node)
+                current_node.parent = parent
+                linked_nodes.append(current_node)
 
             # Add unmatched current events as new roots
             if unmatched_nodes:
-                if segment_id not in self.roots:
-                    self.roots[segment_id] = []
-                self.roots[segment_id].extend(unmatched_nodes)
-                new_ongoing_nodes.extend(unmatched_nodes)
-
-            ongoing_nodes = new_ongoing_nodes
+                self.roots.setdefault(segment_id, []).extend(unmatched_nodes)
+
+        new_ongoing_nodes = {}
+        for node in current_nodes:
+            new_ongoing_nodes.setdefault(node.event.id, node)
+        self.ongoing_nodes = new_ongoing_nodes
+        return linked_nodes
+
+    def _propagate(self, node: StoryNode):
+        # A new leaf adds its particularity to every ancestor and may raise their heights; cached summaries on
+        # the path (root summaries and branch summaries reused by them) no longer cover the whole storyline
+        particularity = node.cumulative_particularity
+        child = node
+        while child.parent is not None:
+            ancestor = child.parent
+            ancestor.cumulative_particularity += particularity
+            ancestor.height = max(ancestor.height, child.height + 1)
+            ancestor.root_summary = ""
+            child = ancestor
 
     def update_node_properties(self):
         for root_nodes in self.roots.values():
@@ -200,17 +226,24 @@ class StoryPool:
 
         # Build summary
         prompt = f"Summarize the following event sequence:\n" + "\n".join(story_descriptions)
-        node.root_summary = f"[Start {node.event.start_time}  Type {node.event.event_type}]" + self.generate_summary(prompt)
+        with tagged("story_summary", segment_id):
+            summary = self.generate_summary(prompt)
+        node.root_summary = f"[Start {node.event.start_time}  Type {node.event.event_type}]" + summary
         return node.root_summary
 
     def _format_event_description(self, event: Event) -> str:
         return f"[Time {event.current_time}] {event.description}"
 
     def get_response(self, messages):
-        openai_model = get_openai_client()
-        response = openai_model.chat.completions.create(
-            model="gpt-4o",
-            messages=messages,
-            temperature=0.5
-        )
-        return response.choices[0].message.content
+        def fetch():
+            openai_model = get_openai_client()
+            start = time.perf_counter()
+            response = openai_model.chat.completions.create(
+                model="gpt-4o",
+                messages=messages,
+                temperature=0.5
+            )
+            get_metrics().record_completion(response, messages, time.perf_counter() - start, model="gpt-4o")
+            return response.choices[0].message.content
+
+        return cached_response("gpt-4o", 0.5, messages, fetch)
@@ -5,6 +5,8 @@ from typing import List
 class Target:
     """Detected target entity."""
 
+    __slots__ = ("id", "parent_segment_id", "parent_event_id", "label", "features", "time")
+
     def __init__(self, id: str, label: str, features: dict, time: int = 0, parent_segment_id: str = None):
         self.id = id  # four-digit ID
         self.parent_segment_id = parent_segment_id  # parent segment ID
@@ -65,7 +67,12 @@ class TargetFactory:
     def create_targets_from_json(self, json_file_path: str, segement_id: str) -> List[Target]:
         """Create multiple Target instances from a JSON file."""
         with open(json_file_path, 'r') as file:
-            targets_data = json.load(file).get("targets", [])
+            data = json.load(file)
+        return self.create_targets_from_data(data, segement_id)
+
+    def create_targets_from_data(self, data: dict, segement_id: str) -> List[Target]:
+        """Create multiple Target instances from an already parsed segment analysis dict."""
+        targets_data = data.get("targets", [])
 
         if not isinstance(targets_data, list):
             raise ValueError("The 'targets' field in the JSON file should be a list")
@@ -0,0 +1,37 @@
+from typing import Dict, List
+from classes.TargetFactory import Target
+
+
+class Track:
+    """One entity followed across segments: the per-segment Target copies merged by entity resolution."""
+
+    __slots__ = ("id", "label", "targets", "segment_ids", "start_time", "end_time", "event_ids", "features", "signature")
+
+    def __init__(self, track_id: str, label: str):
+        self.id = track_id
+        self.label = label
+        self.targets: List[Target] = []  # one per segment, in segment order
+        self.segment_ids: List = []
+        self.start_time = None  # start of the first segment the entity appears in
+        self.end_time = None  # end of the last segment the entity appears in
+        self.event_ids: List[str] = []  # events any of the merged targets takes part in
+        self.features: Dict[str, str] = {}  # latest observed value of each feature
+        self.signature = frozenset()  # hashed feature tokens of the latest observation, used for matching
+
+    def add(self, target: Target, segment_id, start_time: float, end_time: float, signature: frozenset, event_ids: List[str]):
+        self.targets.append(target)
+        self.segment_ids.append(segment_id)
+        self.start_time = start_time if self.start_time is None else min(self.start_time, start_time)
+        self.end_time = end_time if self.end_time is None else max(self.end_time, end_time)
+        self.features.update(target.get_features() or {})
+        self.signature = signature
+        for event_id in event_ids:
+            if event_id not in self.event_ids:
+                self.event_ids.append(event_id)
+
+    def get_last_segment_id(self):
+        return self.segment_ids[-1]
+
+    def __str__(self):
+        return (f"Track(id={self.id}, label={self.label}, features={self.features}, "
+                f"time={self.start_time}-{self.end_time}, segments={len(self.segment_ids)}, events={self.event_ids})")
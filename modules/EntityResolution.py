@@ -0,0 +1,111 @@
+from classes.Segment import Segment
+from classes.Registry import Registry
+from classes.TargetFactory import Target
+from classes.Track import Track
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+import re
+
+# Features that describe what an entity is doing rather than what it is; they change between segments
+VOLATILE_FEATURES = ("action", "direction")
+
+
+def feature_signature(target: Target, ignore_features=VOLATILE_FEATURES) -> frozenset:
+    """
+    Hashed feature tokens of a target: one int per (label, feature key, word of the value).
+
+    Ints make the set intersections and the inverted index lookups cheap; the label is part of every token,
+    so targets with different labels never share one.
+
+    :param ignore_features: Feature keys left out of the signature
+    """
+    label = str(target.get_label()).lower()
+    tokens = set()
+    for key, value in (target.get_features() or {}).items():
+        if key in ignore_features:
+            continue
+        for word in re.findall(r"\w+", str(value).lower()):
+            tokens.add(hash((label, str(key).lower(), word)))
+    return frozenset(tokens)
+
+
+def _event_ids_by_target(segment: Segment, registry: Optional[Registry]) -> Dict[str, List[str]]:
+    """Event ids each target of the segment takes part in (from the registry's reverse map when given)."""
+    if registry is not None:
+        return {str(target.get_id()): [str(e.id) for e in registry.get_events_for_target(segment.id, target.get_id())]
+                for target in segment.targets}
+    event_ids = defaultdict(list)
+    for event in segment.events:
+        for target_id in dict.fromkeys(str(t) for t in event.target_ids or []):
+            event_ids[target_id].append(str(event.id))
+    return event_ids
+
+
+def resolve_tracks(segments: List[Segment], min_similarity: float = 0.5, max_gap: int = 1,
+                   registry: Optional[Registry] = None, ignore_features=VOLATILE_FEATURES) -> List[Track]:
+    """
+    Merge the per-segment copies of the same entity into tracks.
+
+    Overlapping segments report the same car or person again under a fresh id. Segments are walked in time order
+    and each target is matched to a track of the same label last seen at most max_gap segments earlier, by Jaccard
+    similarity of hashed feature signatures. Candidates come from an inverted index of signature tokens, so a
+    target is only compared with tracks it shares a token with. Matching is one-to-one per segment (best pairs
+    first); unmatched targets start new tracks.
+
+    :param segments: Filled segments
+    :param min_similarity: Minimum Jaccard similarity of feature signatures to extend a track
+    :param max_gap: How many segments back a track can be continued from (1 = adjacent segments only)
+    :param registry: Registry to read event membership from (default: scan each segment's events)
+    :param ignore_features: Feature keys not compared (by default the action and direction, which change over time)
+    :return: Tracks in order of first appearance
+    """
+    tracks: List[Track] = []
+    last_seen: Dict[str, int] = {}  # track id -> index of the last segment it was extended in
+
+    for index, segment in enumerate(sorted(segments, key=lambda s: (s.start_time, s.end_time))):
+        active = [track for track in tracks if index - last_seen[track.id] <= max_gap]
+        inverted = defaultdict(list)
+        for track in active:
+            for token in track.signature:
+                inverted[token].append(track)
+
+        event_ids = _event_ids_by_target(segment, registry)
+        signatures = [feature_signature(target, ignore_features) for target in segment.targets]
+        candidates = []
+        for position, (target, signature) in enumerate(zip(segment.targets, signatures)):
+            shared = Counter(track for token in signature for track in inverted.get(token, ()))
+            for track, overlap in shared.items():
+                if track.label != target.get_label():
+                    continue
+                score = overlap / (len(signature) + len(track.signature) - overlap)
+                if score >= min_similarity:
+                    candidates.append((score, position, track))
+
+        used_targets, used_tracks = set(), set()
+        assigned: Dict[int, Track] = {}
+        for score, position, track in sorted(candidates, key=lambda c: (-c[0], c[1])):
+            if position in used_targets or track.id in used_tracks:
+                continue
+            used_targets.add(position)
+            used_tracks.add(track.id)
+            assigned[position] = track
+
+        for position, (target, signature) in enumerate(zip(segment.targets, signatures)):
+            track = assigned.get(position)
+            if track is None:
+                track = Track(f"track_{len(tracks) + 1}", target.get_label())
+                tracks.append(track)
+            track.add(target, segment.id, segment.start_time, segment.end_time, signature,
+                      event_ids.get(str(target.get_id()), []))
+            last_seen[track.id] = index
+    return tracks
+
+
+def get_track_stats(tracks: List[Track]) -> dict:
+    targets = sum(len(track.targets) for track in tracks)
+    return {
+        "targets": targets,
+        "tracks": len(tracks),
+        "merged": targets - len(tracks),
+        "multi_segment_tracks": sum(1 for track in tracks if len(track.segment_ids) > 1),
+    }
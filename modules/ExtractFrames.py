@@ -1,38 +1,244 @@
 import cv2
 import os
+import hashlib
+import itertools
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Tuple
+from classes.FrameManifest import FrameManifest, FrameRecord
 
+# Gaps larger than this (in frames) are crossed with a keyframe seek instead of grabbing forward
+DEFAULT_SEEK_THRESHOLD = 300
 
-def extract_frames(video_path: str, output_dir: str, interval: float = 1.0):
+
+def _iter_sampled_frames(video: cv2.VideoCapture, frame_numbers: Iterable[int],
+                         seek_threshold: int = DEFAULT_SEEK_THRESHOLD) -> Iterator[Tuple[int, float, np.ndarray]]:
+    """
+    Decode only the requested frames from an opened video.
+
+    Frames in between are skipped with grab() (no color conversion or copy), and large gaps are
+    crossed with a seek so the decoder restarts from the nearest keyframe.
+
+    :param video: Opened cv2.VideoCapture
+    :param frame_numbers: Ascending frame numbers to keep
+    :param seek_threshold: Gap in frames above which a seek is used instead of grab()
+    :return: Iterator of (frame_number, pts_seconds, frame)
+    """
+    position = int(video.get(cv2.CAP_PROP_POS_FRAMES))
+    fps = video.get(cv2.CAP_PROP_FPS) or 30
+
+    for target in frame_numbers:
+        if target < position:
+            continue
+
+        if target - position > seek_threshold:
+            video.set(cv2.CAP_PROP_POS_FRAMES, target)
+            position = target
+
+        while position < target:
+            if not video.grab():
+                return
+            position += 1
+
+        success, frame = video.read()
+        if not success:
+            return
+        position += 1
+
+        # Real presentation timestamp of the decoded frame; some backends only report frame positions
+        pts = video.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+        if pts <= 0 and target > 0:
+            pts = target / fps
+
+        yield target, pts, frame
+
+
+def _interval_frame_numbers(video: cv2.VideoCapture, interval: float) -> Iterable[int]:
+    fps = video.get(cv2.CAP_PROP_FPS)
+    frames_to_skip = max(1, int(fps * interval))
+    total_frames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    # Some containers do not report a frame count; sample until the stream ends
+    if total_frames <= 0:
+        return itertools.count(0, frames_to_skip)
+    return range(0, total_frames, frames_to_skip)
+
+
+def _save_frame(output_dir: str, frame_number: int, pts: float, frame: np.ndarray) -> Optional[FrameRecord]:
+    """Write one frame as frame_XXXXXX.jpg; None (and no file) if it cannot be encoded."""
+    output_filename = os.path.join(output_dir, f"frame_{frame_number:06d}.jpg")
+    try:
+        success, buffer = cv2.imencode(".jpg", frame)
+    except cv2.error as e:
+        print(f"Error encoding frame {frame_number}: {e}")
+        return None
+    if not success:
+        print(f"Error encoding frame {frame_number}")
+        return None
+    data = buffer.tobytes()
+    with open(output_filename, "wb") as f:
+        f.write(data)
+    print(f"Saved frame: {output_filename}")
+    return frame_number, pts, output_filename, hashlib.sha1(data).hexdigest()
+
+
+def _write_manifest(manifest_path: str, records: List[FrameRecord]):
+    manifest = FrameManifest(manifest_path)
+    manifest.clear()
+    manifest.add_frames(records)
+    manifest.close()
+
+
+def extract_frames(video_path: str, output_dir: str, interval: float = 1.0, seek_threshold: int = DEFAULT_SEEK_THRESHOLD,
+                   manifest_path: str = None):
     """
     Extract a frame every n seconds from a video and save as images.
 
+    Only the kept frames are fully decoded; skipped frames are grabbed without retrieval.
+
     :param video_path: Path to input video
     :param output_dir: Output directory for images
     :param interval: Interval in seconds (default: 1.0)
+    :param seek_threshold: Gap in frames above which a keyframe seek is used (default: 300)
+    :param manifest_path: Optional FrameManifest database to record frame number, pts, path and hash
     :return: List of saved image file paths
     """
     os.makedirs(output_dir, exist_ok=True)
 
+    video = cv2.VideoCapture(video_path)
+    records = []
+
+    frame_numbers = _interval_frame_numbers(video, interval)
+    for frame_number, pts, frame in _iter_sampled_frames(video, frame_numbers, seek_threshold):
+        record = _save_frame(output_dir, frame_number, pts, frame)
+        if record is not None:
+            records.append(record)
+
+    video.release()
+    if manifest_path:
+        _write_manifest(manifest_path, records)
+    return [record[2] for record in records]
+
+
+def iter_frames(video_path: str, interval: float = 1.0, spill_dir: str = None, jpeg_quality: int = 95,
+                seek_threshold: int = DEFAULT_SEEK_THRESHOLD) -> Iterator[Tuple[int, float, bytes]]:
+    """
+    Stream a frame every n seconds as encoded JPEG buffers without touching the filesystem.
+
+    :param video_path: Path to input video
+    :param interval: Interval in seconds (default: 1.0)
+    :param spill_dir: Optional directory to also write the frames to as frame_XXXXXX.jpg
+    :param jpeg_quality: JPEG quality of the encoded buffers (default: 95, OpenCV's default)
+    :param seek_threshold: Gap in frames above which a keyframe seek is used (default: 300)
+    :return: Iterator of (frame_number, pts_seconds, jpeg_bytes)
+    """
+    if spill_dir:
+        os.makedirs(spill_dir, exist_ok=True)
+
+    video = cv2.VideoCapture(video_path)
+    frame_numbers = _interval_frame_numbers(video, interval)
+    encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), jpeg_quality]
+
+    try:
+        for frame_number, pts, frame in _iter_sampled_frames(video, frame_numbers, seek_threshold):
+            success, buffer = cv2.imencode(".jpg", frame, encode_params)
+            if not success:
+                print(f"Error encoding frame {frame_number}")
+                continue
+            data = buffer.tobytes()
+
+            if spill_dir:
+                with open(os.path.join(spill_dir, f"frame_{frame_number:06d}.jpg"), "wb") as f:
+                    f.write(data)
+
+            yield frame_number, pts, data
+    finally:
+        video.release()
+
+
+def extract_frames_at(video_path: str, output_dir: str, timestamps: List[float], seek_threshold: int = DEFAULT_SEEK_THRESHOLD,
+                      manifest_path: str = None):
+    """
+    Extract the frames closest to the given timestamps and save as images.
+
+    :param video_path: Path to input video
+    :param output_dir: Output directory for images
+    :param timestamps: Timestamps in seconds, in any order
+    :param seek_threshold: Gap in frames above which a keyframe seek is used (default: 300)
+    :param manifest_path: Optional FrameManifest database to record frame number, pts, path and hash
+    :return: List of saved image file paths, ordered by frame number
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
     video = cv2.VideoCapture(video_path)
     fps = video.get(cv2.CAP_PROP_FPS)
-    frames_to_skip = int(fps * interval)
+    frame_numbers = sorted({int(round(t * fps)) for t in timestamps if t >= 0})
+    records = []
 
-    frame_count = 0
-    saved_frames = []
+    for frame_number, pts, frame in _iter_sampled_frames(video, frame_numbers, seek_threshold):
+        record = _save_frame(output_dir, frame_number, pts, frame)
+        if record is not None:
+            records.append(record)
 
-    while True:
-        success, frame = video.read()
-        if not success:
-            break
+    video.release()
+    if manifest_path:
+        _write_manifest(manifest_path, records)
+    return [record[2] for record in records]
 
-        if frame_count % frames_to_skip == 0:
-            output_filename = os.path.join(output_dir, f"frame_{frame_count:06d}.jpg")
-            cv2.imwrite(output_filename, frame)
-            saved_frames.append(output_filename)
-            print(f"Saved frame: {output_filename}")
 
-        frame_count += 1
+def _extract_range(video_path: str, output_dir: str, frame_numbers: range, seek_threshold: int) -> List[FrameRecord]:
+    """Worker: decode one contiguous range of sampled frames with its own capture."""
+    video = cv2.VideoCapture(video_path)
+    if len(frame_numbers) and frame_numbers[0] > 0:
+        video.set(cv2.CAP_PROP_POS_FRAMES, frame_numbers[0])
+
+    records = []
+    for frame_number, pts, frame in _iter_sampled_frames(video, frame_numbers, seek_threshold):
+        record = _save_frame(output_dir, frame_number, pts, frame)
+        if record is not None:
+            records.append(record)
 
     video.release()
-    return saved_frames
+    return records
+
+
+def extract_frames_parallel(video_path: str, output_dir: str, interval: float = 1.0, num_workers: int = None,
+                            seek_threshold: int = DEFAULT_SEEK_THRESHOLD, manifest_path: str = None):
+    """
+    Extract a frame every n seconds, decoding N time ranges of the video in parallel processes.
+
+    Produces the same frame_XXXXXX.jpg sequence as extract_frames.
+
+    :param video_path: Path to input video
+    :param output_dir: Output directory for images
+    :param interval: Interval in seconds (default: 1.0)
+    :param num_workers: Number of processes / time ranges (default: CPU count)
+    :param seek_threshold: Gap in frames above which a keyframe seek is used (default: 300)
+    :param manifest_path: Optional FrameManifest database to record frame number, pts, path and hash
+    :return: List of saved image file paths, ordered by frame number
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    video = cv2.VideoCapture(video_path)
+    frame_numbers = _interval_frame_numbers(video, interval)
+    video.release()
+
+    # Without a reliable frame count the video cannot be split into ranges
+    if not isinstance(frame_numbers, range):
+        return extract_frames(video_path, output_dir, interval=interval, seek_threshold=seek_threshold,
+                              manifest_path=manifest_path)
+
+    num_workers = max(1, min(num_workers or os.cpu_count() or 1, len(frame_numbers)))
+    chunk_size = -(-len(frame_numbers) // num_workers) if len(frame_numbers) else 1
+    ranges = [frame_numbers[i:i + chunk_size] for i in range(0, len(frame_numbers), chunk_size)]
+
+    records = []
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        futures = [executor.submit(_extract_range, video_path, output_dir, r, seek_threshold) for r in ranges]
+        for future in futures:
+            records.extend(future.result())
+
+    # Workers only write image files; the manifest has a single writer
+    if manifest_path:
+        _write_manifest(manifest_path, records)
+    return [record[2] for record in records]
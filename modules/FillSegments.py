@@ -1,45 +1,121 @@
 from classes.EventFactory import EventFactory
 from classes.TargetFactory import TargetFactory
 from classes.Segment import Segment
-from typing import List
+from classes.Registry import Registry
+from classes.AnalysisStore import get_analysis_store
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional
 import os
 import json
 import logging
 
+try:
+    import orjson  # optional, several times faster than json for segment files
+except ImportError:
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
 
-def fill_segments(segments: List[Segment], event_factory: EventFactory, target_factory: TargetFactory, video_name: str):
+def parse_segment_file(segment_file_path: str, use_orjson: bool = True) -> dict:
+    """Read and decode a segment analysis file once (with orjson if installed and use_orjson is set)."""
+    with open(segment_file_path, 'rb') as file:
+        content = file.read()
+    if use_orjson and orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def load_segment(segment_id, segment_file_path: str, event_factory: EventFactory, target_factory: TargetFactory,
+                 use_orjson: bool = True):
+    """
+    Parse one segment file and build its targets and events from the parsed dict.
+
+    :return: (summary, targets, events)
+    """
+    return build_segment(segment_id, parse_segment_file(segment_file_path, use_orjson=use_orjson), event_factory, target_factory)
+
+
+def build_segment(segment_id, segment_data: dict, event_factory: EventFactory, target_factory: TargetFactory):
+    """Build a segment's (summary, targets, events) from its parsed result dict."""
+    targets_data = target_factory.create_targets_from_data(segment_data, segement_id=segment_id)
+    events_data = event_factory.create_events_from_data(segment_data, segment_id=segment_id, target_list=targets_data)
+    return segment_data.get("summary", ""), targets_data, events_data
+
+
+def _load_segment_task(task):
+    # Module-level so process pools can pickle it; errors are returned so one bad file does not stop the rest
+    segment_id, segment_file_path, segment_data, event_factory, target_factory, use_orjson = task
+    try:
+        if segment_data is not None:
+            return build_segment(segment_id, segment_data, event_factory, target_factory), None
+        return load_segment(segment_id, segment_file_path, event_factory, target_factory, use_orjson), None
+    except json.JSONDecodeError as e:  # orjson.JSONDecodeError subclasses it
+        return None, f"Invalid JSON for segment {segment_id}: {e}"
+
+
+def fill_segments(segments: List[Segment], event_factory: EventFactory, target_factory: TargetFactory, video_name: str,
+                  max_workers: Optional[int] = None, use_processes: bool = False, use_orjson: bool = True,
+                  registry: Optional[Registry] = None):
+    """
+    Populate segments with the summary, targets and events of their segment_analysis/segment_N.json files.
+
+    With ANALYSIS_STORE=sqlite, results in the video's analysis store are read in one bulk query and files are
+    only used for segments missing from it. Each file is read and parsed once. With max_workers, files are loaded by a thread pool, or by a process pool
+    with use_processes=True (parsing and object construction are CPU-bound, so processes scale past the GIL).
+
+    :param max_workers: Loader pool size (default: load serially)
+    :param use_processes: Use a process pool instead of threads
+    :param use_orjson: Decode with orjson when it is installed
+    :param registry: Registry to index the loaded targets and events in (shared with StoryPool and the RAG agent)
+    """
     errors = []
+    tasks = []
+    store = get_analysis_store(video_name)
+    stored = store.read_results([segment.id for segment in segments]) if store is not None else {}
     for segment in segments:
         segment_file_path = f"{video_name}/segment_analysis/segment_{segment.id}.json"
+        segment_data = stored.get(int(segment.id))
 
+        if segment_data is not None:
+            tasks.append((segment, (segment.id, None, segment_data, event_factory, target_factory, use_orjson)))
+            continue
         if not os.path.exists(segment_file_path):
             msg = f"File not found for segment {segment.id}: {segment_file_path}"
             logger.error(msg)
             errors.append((segment.id, msg))
             continue
+        tasks.append((segment, (segment.id, segment_file_path, None, event_factory, target_factory, use_orjson)))
 
-        try:
-            with open(segment_file_path, 'r', encoding='utf-8') as file:
-                segment_data = json.load(file)
-                targets_data = target_factory.create_targets_from_json(json_file_path=segment_file_path, segement_id=segment.id)
-                events_data = event_factory.create_events_from_json(json_file_path=segment_file_path, target_list=targets_data, segment_id=segment.id)
-                summary = segment_data.get("summary", "")
+    if max_workers is None:
+        results = map(_load_segment_task, [task for _, task in tasks])
+        executor = None
+    else:
+        executor = (ProcessPoolExecutor if use_processes else ThreadPoolExecutor)(max_workers=max_workers)
+        # Batches keep inter-process overhead low for thousands of small files
+        chunksize = max(1, len(tasks) // (max_workers * 4)) if use_processes else 1
+        results = executor.map(_load_segment_task, [task for _, task in tasks], chunksize=chunksize)
 
-                # Extra handling (to be improved): propagate segment time as current_time
-                for event in events_data:
-                    event.current_time = segment.start_time
+    try:
+        for (segment, _), (loaded, msg) in zip(tasks, results):
+            if loaded is None:
+                logger.error(msg)
+                errors.append((segment.id, msg))
+                continue
+            summary, targets_data, events_data = loaded
 
-                segment.set_summary(summary)
-                segment.set_targets(targets_data)
-                segment.set_events(events_data)
+            # Extra handling (to be improved): propagate segment time as current_time
+            for event in events_data:
+                event.current_time = segment.start_time
 
-        except json.JSONDecodeError as e:
-            msg = f"Invalid JSON for segment {segment.id}: {e}"
-            logger.error(msg)
-            errors.append((segment.id, msg))
-            continue
+            segment.set_summary(summary)
+            segment.set_targets(targets_data)
+            segment.set_events(events_data)
+            if registry is not None:
+                registry.add_segment(segment)
+    finally:
+        if executor is not None:
+            executor.shutdown()
 
     if errors:
         logger.warning("FillSegments completed with %d error(s).", len(errors))
@@ -0,0 +1,80 @@
+import cv2
+import numpy as np
+from typing import List, Optional, Sequence, Tuple
+
+# Signatures are small grayscale thumbnails; differences are measured on these, not on full frames
+SIGNATURE_SIZE = (64, 36)
+# Per-pixel intensity change that counts as motion rather than sensor noise or compression artefacts
+PIXEL_DELTA = 12
+
+
+def frame_signature(image: np.ndarray) -> Optional[np.ndarray]:
+    """
+    Reduce a decoded frame to a small blurred grayscale thumbnail used for frame differencing.
+
+    :param image: BGR or grayscale image
+    :return: float32 array of SIGNATURE_SIZE, or None if the image is missing
+    """
+    if image is None:
+        return None
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    thumb = cv2.resize(image, SIGNATURE_SIZE, interpolation=cv2.INTER_AREA)
+    return cv2.GaussianBlur(thumb, (3, 3), 0).astype(np.float32)
+
+
+def signature_from_path(image_path: str) -> Optional[np.ndarray]:
+    # Reduced decoding skips most of the JPEG work for a thumbnail-sized result
+    return frame_signature(cv2.imread(image_path, cv2.IMREAD_REDUCED_GRAYSCALE_4))
+
+
+def signature_from_bytes(image_bytes: bytes) -> Optional[np.ndarray]:
+    buffer = np.frombuffer(image_bytes, dtype=np.uint8)
+    return frame_signature(cv2.imdecode(buffer, cv2.IMREAD_REDUCED_GRAYSCALE_4))
+
+
+def frame_difference(a: np.ndarray, b: np.ndarray) -> float:
+    """Fraction of signature pixels that changed by more than PIXEL_DELTA, in [0, 1]."""
+    return float(np.count_nonzero(np.abs(a - b) > PIXEL_DELTA)) / a.size
+
+
+def select_frames(signatures: Sequence[Optional[np.ndarray]], threshold: float = 0.005,
+                  max_gap: Optional[int] = None) -> Tuple[List[int], List[int]]:
+    """
+    Select frames that differ enough from the last kept frame.
+
+    The first frame is always kept. Frames without a signature are kept so nothing is silently lost.
+
+    :param signatures: Frame signatures in temporal order
+    :param threshold: Minimum fraction of changed pixels relative to the last kept frame (default: 0.005)
+    :param max_gap: Keep at least one frame every max_gap frames even in static scenes (default: None)
+    :return: (kept_indices, dropped_indices)
+    """
+    kept, dropped = [], []
+    last_kept = None
+
+    for index, signature in enumerate(signatures):
+        if last_kept is None or signature is None or signatures[last_kept] is None:
+            keep = True
+        elif max_gap is not None and index - last_kept >= max_gap:
+            keep = True
+        else:
+            keep = frame_difference(signature, signatures[last_kept]) > threshold
+
+        if keep:
+            kept.append(index)
+            last_kept = index
+        else:
+            dropped.append(index)
+
+    return kept, dropped
+
+
+def describe_dropped_frames(segment) -> str:
+    """Prompt note telling the model which frame times were kept when near-identical frames were dropped."""
+    if not segment.dropped_frame_times:
+        return ""
+    kept_times = ", ".join(f"{t:.2f}" for t in segment.image_times)
+    return (f"\n— Frame selection —\n"
+            f"{len(segment.dropped_frame_times)} near-identical frames were dropped; the scene did not change between kept frames.\n"
+            f"Kept frame times: {kept_times}\n")
@@ -1,6 +1,7 @@
 from langchain_core.documents import Document
 from classes.StoryTree import StoryPool
 from classes.Segment import Segment
+from classes.Track import Track
 from typing import List
 
 
@@ -41,6 +42,26 @@ def load_targets(segments: List[Segment]) -> List[Document]:
     return docs
 
 
+def load_tracks(tracks: List[Track]) -> List[Document]:
+    """Build one document per entity track (see EntityResolution.resolve_tracks) instead of one per target copy."""
+    docs = []
+    for track in tracks:
+        # The first target with an event stands in for the track in the agent's event lookup
+        anchor = next((t for t in track.targets if t.parent_event_id not in (None, "-1")), track.targets[0])
+        metadata = {
+            "segment_id": anchor.parent_segment_id,
+            "parent_event_id": anchor.parent_event_id or "-1",
+            "time": track.start_time,
+            "end_time": track.end_time,
+            "track_id": track.id,
+            "label": track.label,
+            "segment_ids": ",".join(str(s) for s in track.segment_ids),
+        }
+        doc = Document(page_content=str(track), metadata=metadata)
+        docs.append(doc)
+    return docs
+
+
 def load_segments(segments: List[Segment]) -> List[Document]:
     """Build documents for raw segment content."""
     docs = []
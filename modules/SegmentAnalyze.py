@@ -1,45 +1,64 @@
 from concurrent.futures import ThreadPoolExecutor
 import threading
 from classes.Segment import Segment
-from utils.ai import get_openai_client
+from classes.RunJournal import RunJournal, COMPLETED, FAILED
+from classes.AnalysisStore import get_analysis_store
+from utils import ai
+from utils.ai import get_image_detail
+from utils.cache import cached_response, is_json
+from utils.metrics import get_metrics, tagged
 import json
 import os
 import time
 from typing import List
 from prompts import segment_analyze_prompt
+from modules.FrameSelection import describe_dropped_frames
+from classes.FrameMosaic import describe_mosaics
 from functools import partial
 
-openai_model = get_openai_client()
-
 # Thread-local storage so each thread has its own OpenAI client
 thread_local = threading.local()
 
 
 def get_openai_client():
     if not hasattr(thread_local, 'openai_client'):
-        thread_local.openai_client = openai_model
+        thread_local.openai_client = ai.get_openai_client()
     return thread_local.openai_client
 
 
 def get_response(messages):
-    client = get_openai_client()
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=messages,
-        temperature=0
-    )
-    return response.choices[0].message.content
-
-
-def batch_process_segments(segments: List[Segment], target_factory, event_factory, video_name: str, max_workers=5):
-    """Process segments concurrently using a thread pool."""
+    def fetch():
+        client = get_openai_client()
+        start = time.perf_counter()
+        response = client.chat.completions.create(
+            model="gpt-4o",
+            messages=messages,
+            temperature=0
+        )
+        get_metrics().record_completion(response, messages, time.perf_counter() - start, model="gpt-4o")
+        return response.choices[0].message.content
+
+    # The response is used with json.loads: unparseable text is not cached, so a failed segment is re-requested
+    return cached_response("gpt-4o", 0, messages, fetch, validate=is_json)
+
+
+def batch_process_segments(segments: List[Segment], target_factory, event_factory, video_name: str, max_workers=5, detail=None, resume=False):
+    """
+    Process segments concurrently using a thread pool.
+
+    Outcomes are journaled in {video_name}/segment_analysis/_journal.jsonl; with resume=True, segments that
+    already completed with unchanged inputs are skipped and their stored result is returned.
+    """
+    journal = RunJournal.for_video(video_name)
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        partial_process = partial(process_segment, target_factory=target_factory, event_factory=event_factory, video_name=video_name)
+        partial_process = partial(process_segment, target_factory=target_factory, event_factory=event_factory, video_name=video_name, detail=detail,
+                                  journal=journal, resume=resume)
         results = list(executor.map(partial_process, segments))
     return results
 
 
-def create_messages(system_prompt, user_prompt, images):
+def create_messages(system_prompt, user_prompt, images, detail=None):
+    detail = detail or get_image_detail()
     messages = [
         {"role": "system", "content": system_prompt},
         {
@@ -53,13 +72,19 @@ def create_messages(system_prompt, user_prompt, images):
         base64_image = image
         messages[1]["content"].append({
             "type": "image_url",
-            "image_url": {"url": f"data:image/jpeg;base64,{base64_image}", "detail": "high"},
+            "image_url": {"url": f"data:image/jpeg;base64,{base64_image}", "detail": detail},
         })
 
     return messages
 
 
 def write_result_to_file(segment_id, result, video_name):
+    store = get_analysis_store(video_name)
+    if store is not None:
+        store.write_result(segment_id, result)
+        print(f"Result for segment {segment_id} has been written to {store.db_path}")
+        return
+
     # Ensure output directory exists
     output_dir = f"{video_name}/segment_analysis"
     os.makedirs(output_dir, exist_ok=True)
@@ -72,7 +97,7 @@ def write_result_to_file(segment_id, result, video_name):
     print(f"Result for segment {segment_id} has been written to {filename}")
 
 
-def process_segment(segment: Segment, event_factory, target_factory, video_name: str):
+def build_messages(segment: Segment, event_factory, target_factory, detail=None):
     images = segment.get_images()
     target_features = target_factory.get_fearures()
     event_features = event_factory.get_event_type_descriptions()
@@ -82,10 +107,54 @@ def process_segment(segment: Segment, event_factory, target_factory, video_name:
         target_config=target_features,
         event_config=event_features,
         start_time=segment.start_time,
+    ) + describe_dropped_frames(segment) + describe_mosaics(segment)
+    return create_messages(sys_prompt, user_prompt, images, detail=detail)
+
+
+def segment_fingerprint(segment: Segment, event_factory, target_factory, detail=None):
+    return RunJournal.fingerprint(
+        segment,
+        segment_analyze_prompt.SEGEMENT_ANALYZE_SYS_PROMPT,
+        segment_analyze_prompt.SEGEMENT_ANALYZE_USER_PROMPT,
+        target_factory.get_fearures(),
+        event_factory.get_event_type_descriptions(),
+        describe_dropped_frames(segment),
+        describe_mosaics(segment),
+        detail or get_image_detail()
     )
-    messages = create_messages(sys_prompt, user_prompt, images)
-    result = json.loads(get_response(messages))
+
+
+def read_result(segment_id, video_name: str):
+    store = get_analysis_store(video_name)
+    if store is not None:
+        result = store.read_result(segment_id)
+        if result is not None:
+            return result
+    with open(os.path.join(f"{video_name}/segment_analysis", f"segment_{segment_id}.json"), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def process_segment(segment: Segment, event_factory, target_factory, video_name: str, detail=None, journal: RunJournal = None, resume=False):
+    fingerprint = None
+    if journal is not None:
+        fingerprint = segment_fingerprint(segment, event_factory, target_factory, detail=detail)
+        if resume and journal.is_done(segment.id, fingerprint, video_name):
+            print(f"Skipping segment {segment.id}: already analyzed with unchanged inputs")
+            return read_result(segment.id, video_name)
+
+    try:
+        messages = build_messages(segment, event_factory, target_factory, detail=detail)
+        with tagged("segment_analysis", segment.id):
+            result = json.loads(get_response(messages))
+    except Exception as e:
+        if journal is not None:
+            journal.record(segment.id, FAILED, fingerprint, error=str(e))
+        raise
+    finally:
+        segment.release_images()
 
     write_result_to_file(segment.id, result, video_name)
+    if journal is not None:
+        journal.record(segment.id, COMPLETED, fingerprint)
 
     return result
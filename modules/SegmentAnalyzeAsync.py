@@ -0,0 +1,97 @@
+import asyncio
+import json
+from typing import List
+from classes.Segment import Segment
+from classes.RunJournal import RunJournal, COMPLETED, FAILED
+from modules.SegmentAnalyze import build_messages, read_result, segment_fingerprint, write_result_to_file
+from utils.ai import get_async_openai_client
+from utils.metrics import tagged
+from utils.ratelimit import TokenBucketLimiter, async_chat_completion_with_retry
+
+
+async def analyze_segment(segment: Segment, event_factory, target_factory, video_name: str, client,
+                          limiter: TokenBucketLimiter, semaphore: asyncio.Semaphore, detail=None, max_retries: int = 5,
+                          journal: RunJournal = None, resume: bool = False):
+    """Analyze one segment (non-chained SegmentAnalyze prompt) under the shared limiter and concurrency cap."""
+    fingerprint = None
+    if journal is not None:
+        fingerprint = await asyncio.to_thread(segment_fingerprint, segment, event_factory, target_factory, detail)
+        if resume and journal.is_done(segment.id, fingerprint, video_name):
+            return await asyncio.to_thread(read_result, segment.id, video_name)
+
+    try:
+        async with semaphore:
+            # Image loading and encoding are blocking; keep them off the event loop
+            messages = await asyncio.to_thread(build_messages, segment, event_factory, target_factory, detail)
+            with tagged("segment_analysis", segment.id):
+                response = await async_chat_completion_with_retry(
+                    client,
+                    limiter,
+                    messages,
+                    max_retries=max_retries,
+                    model="gpt-4o",
+                    temperature=0
+                )
+        result = json.loads(response.choices[0].message.content)
+    except Exception as e:
+        if journal is not None:
+            journal.record(segment.id, FAILED, fingerprint, error=str(e))
+        raise
+    finally:
+        segment.release_images()
+
+    await asyncio.to_thread(write_result_to_file, segment.id, result, video_name)
+    if journal is not None:
+        journal.record(segment.id, COMPLETED, fingerprint)
+    return result
+
+
+async def process_segments_async(segments: List[Segment], target_factory, event_factory, video_name: str,
+                                 requests_per_minute: float = None, tokens_per_minute: float = None,
+                                 max_concurrency: int = 32, detail=None, client=None, max_retries: int = 5,
+                                 resume: bool = False):
+    """
+    Analyze segments concurrently, paced by a token bucket instead of fixed sleeps.
+
+    :param segments: Segments to analyze
+    :param target_factory: TargetFactory providing the entity schema
+    :param event_factory: EventFactory providing the event types
+    :param video_name: Output folder; results go to {video_name}/segment_analysis
+    :param requests_per_minute: Request budget (default: OPENAI_RPM_LIMIT, unlimited if unset)
+    :param tokens_per_minute: Token budget (default: OPENAI_TPM_LIMIT, unlimited if unset)
+    :param max_concurrency: Maximum requests in flight
+    :param detail: Image detail level (default: OPENAI_IMAGE_DETAIL)
+    :param client: AsyncOpenAI-compatible client (default: utils.ai.get_async_openai_client())
+    :param max_retries: Retries per segment for 429s and transient errors
+    :param resume: Skip segments the run journal ({video_name}/segment_analysis/_journal.jsonl) lists as
+        completed with unchanged inputs
+    :return: List of results in segment order; None for segments that failed
+    """
+    if requests_per_minute is None and tokens_per_minute is None:
+        limiter = TokenBucketLimiter.from_env()
+    else:
+        limiter = TokenBucketLimiter(requests_per_minute, tokens_per_minute)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    client = client or get_async_openai_client()
+    journal = RunJournal.for_video(video_name)
+
+    tasks = [
+        analyze_segment(segment, event_factory, target_factory, video_name, client, limiter, semaphore,
+                        detail=detail, max_retries=max_retries, journal=journal, resume=resume)
+        for segment in segments
+    ]
+    outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+
+    results = []
+    for segment, outcome in zip(segments, outcomes):
+        if isinstance(outcome, BaseException):
+            print(f"Error analyzing segment {segment.id}: {outcome}")
+            results.append(None)
+        else:
+            results.append(outcome)
+    return results
+
+
+def batch_process_segments_async(segments: List[Segment], target_factory, event_factory, video_name: str, **kwargs):
+    """Synchronous entry point (scripts/notebooks without a running loop) for process_segments_async."""
+    return asyncio.run(process_segments_async(segments, target_factory, event_factory, video_name, **kwargs))
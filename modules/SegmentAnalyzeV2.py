@@ -1,17 +1,31 @@
-import time
+from concurrent.futures import ThreadPoolExecutor
+from collections import defaultdict
 from classes.Segment import Segment
 from classes.TargetFactory import TargetFactory
 from classes.EventFactory import EventFactory
-from utils.ai import get_openai_client
+from utils.ai import get_openai_client, get_image_detail
+from utils.ratelimit import TokenBucketLimiter, chat_completion_with_retry, stream_chat_completion_with_retry
+from utils.json_stream import IncrementalJsonParser
+from utils.cache import cached_response, is_json
+from utils.metrics import get_metrics, tagged
+from classes.RunJournal import RunJournal, COMPLETED, FAILED, RAW_TEXT
+from classes.ContextBuilder import ContextBuilder
+from classes.AnalysisStore import get_analysis_store
 import json
 import os
 import re
+import time
 from typing import List
 from prompts import segment_analyze_prompt_v2
+from modules.FrameSelection import describe_dropped_frames
+from classes.FrameMosaic import describe_mosaics
 import uuid
 
 openai_model = get_openai_client()
 
+# Shared limiter (OPENAI_RPM_LIMIT / OPENAI_TPM_LIMIT); 429s are waited out per the server's retry-after
+rate_limiter = TokenBucketLimiter.from_env()
+
 
 def extract_json_from_markdown(text):
     """Extract JSON content from fenced code blocks if present."""
@@ -26,38 +40,170 @@ def extract_json_from_markdown(text):
     return text
 
 
-def get_response(messages):
-    response = openai_model.chat.completions.create(
-        model="gpt-4o",
-        messages=messages,
-        temperature=0.7
-    )
-    return response.choices[0].message.content
+def get_response(messages, on_element=None, on_reset=None):
+    """
+    Return the completion text.
+
+    :param on_element: If given, the completion is streamed and on_element(key, element) is called for each
+        target/event as soon as it is complete (all at once on a cache hit)
+    :param on_reset: Called when a broken-off stream is re-requested; elements emitted so far are void
+    """
+    if on_element is None:
+        def fetch():
+            response = chat_completion_with_retry(
+                openai_model,
+                rate_limiter,
+                model="gpt-4o",
+                messages=messages,
+                temperature=0.7
+            )
+            return response.choices[0].message.content
+    else:
+        parser = IncrementalJsonParser(keys=("targets", "events"))
+
+        def emit(delta):
+            items = parser.feed(delta)
+            for key, element in items:
+                on_element(key, element)
+            return bool(items)
+
+        def restart():
+            nonlocal parser
+            parser = IncrementalJsonParser(keys=("targets", "events"))
+            if on_reset is not None:
+                on_reset()
+
+        def fetch():
+            return stream_chat_completion_with_retry(
+                openai_model,
+                rate_limiter,
+                messages,
+                on_delta=emit,
+                on_retry=restart,
+                model="gpt-4o",
+                temperature=0.7
+            )
+
+    # Text parse_result would store as raw_text is not cached, so redoing a RAW_TEXT segment asks the model again
+    content = cached_response("gpt-4o", 0.7, messages, fetch, validate=lambda text: is_json(extract_json_from_markdown(text)))
+    if on_element is not None and not parser.get_text():
+        emit(content)
+    return content
+
+
+class StreamedContext:
+    """
+    Builds a segment's targets and the next segment's previous-event context while its response streams in.
+
+    Renders the same text build_previous_context would from the finished result. If elements arrive out of
+    schema order (targets after events) or fail validation, it is marked invalid and callers fall back to
+    build_previous_context.
+    """
 
+    def __init__(self, segment_id, target_factory: TargetFactory, event_factory: EventFactory):
+        self.segment_id = segment_id
+        self.target_factory = target_factory
+        self.event_factory = event_factory
+        self.reset()
 
-def process_segments_serially(segments: List[Segment], target_factory, event_factory, video_name: str, subsection_interval):
+    def reset(self):
+        """Forget streamed elements (the response is being received again)."""
+        self.targets = []
+        self.event_strs = []
+        self.event_count = 0
+        self.valid = True
+
+    def on_element(self, key, element):
+        if not self.valid:
+            return
+        try:
+            if key == "targets":
+                if self.event_count:
+                    self.valid = False  # earlier events were rendered without this target
+                    return
+                self.targets.extend(self.target_factory.create_targets_from_data({"targets": [element]}, self.segment_id))
+            else:
+                index = self.event_count
+                self.event_count += 1
+                if element.get("particularity") != 0:
+                    event = self.event_factory.create_event(
+                        event_id=event_uuid(self.segment_id, index, element),
+                        event_type=element.get("event_type"),
+                        start_time=element.get("start_time"),
+                        target_ids=element.get("target_ids"),
+                        description=element.get("description"),
+                        particularity=element.get("particularity"),
+                        cause_event_id=element.get("cause_event_id"),
+                        cause=element.get("cause"),
+                        target_list=self.targets,
+                        segment_id=self.segment_id
+                    )
+                    self.event_strs.append(str(event) + "\n")
+        except (ValueError, TypeError, AttributeError):
+            self.valid = False
+
+    def matches(self, result_json) -> bool:
+        """Whether every target and event of the parsed result was streamed and rendered."""
+        return (self.valid and "raw_text" not in result_json
+                and len(self.targets) == len(result_json.get("targets") or [])
+                and self.event_count == len(result_json.get("events") or []))
+
+    def previous_context(self, next_segment: Segment, result_json, summary_subsection_interval):
+        """(previous_event_str, previous_summary) for next_segment, as build_previous_context renders them."""
+        previous_summary = ""
+        if int(next_segment.id) % summary_subsection_interval != 0:
+            previous_summary = result_json.get("summary")
+        return "\n".join(self.event_strs), previous_summary
+
+
+def process_segments_serially(segments: List[Segment], target_factory, event_factory, video_name: str, subsection_interval, detail=None,
+                              resume: bool = False, stream: bool = False, context_builder: ContextBuilder = None):
+    """
+    Analyze segments one after another, each with the previous segment's result as context.
+
+    Outcomes are journaled in {video_name}/segment_analysis/_journal.jsonl. With resume=True, segments that
+    already completed with identical inputs (frames, prompt and previous context) are skipped; a re-analyzed
+    segment changes the next one's context, so only what actually changed is redone.
+
+    :param context_builder: Render the previous-segment context compactly within a token budget, from the
+        result kept in memory (default: the str(event) rendering of the result read from disk)
+    """
+    journal = RunJournal.for_video(video_name)
     for segment in segments:
-        process_segment(segment, target_factory, event_factory, video_name=video_name, summary_subsection_interval=subsection_interval)
+        process_segment(segment, target_factory, event_factory, video_name=video_name, summary_subsection_interval=subsection_interval, detail=detail,
+                        journal=journal, resume=resume, stream=stream, context_builder=context_builder)
+
+
+def create_image_parts(images, detail=None):
+    detail = detail or get_image_detail()
+    return [
+        {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{image}", "detail": detail}}
+        for image in images
+    ]
 
 
-def create_messages(system_prompt, user_prompt, images):
+def create_messages(system_prompt, user_prompt, images, detail=None, image_parts=None):
     messages = [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": [{"type": "text", "text": user_prompt}]}
     ]
 
-    # Attach images to the user message
-    for image in images:
-        base64_image = image
-        messages[1]["content"].append({
-            "type": "image_url",
-            "image_url": {"url": f"data:image/jpeg;base64,{base64_image}", "detail": "high"}
-        })
+    # Attach images to the user message (image_parts may be prepared ahead of time)
+    if image_parts is None:
+        image_parts = create_image_parts(images, detail=detail)
+    messages[1]["content"].extend(image_parts)
 
     return messages
 
 
 def write_result_to_file(segment_id, result, video_name):
+    # With ANALYSIS_STORE=sqlite results go to {video_name}/analysis.db instead of one file per segment
+    store = get_analysis_store(video_name)
+    if store is not None:
+        store.write_result(segment_id, result)
+        print(f"Result for segment {segment_id} has been written to {store.db_path}")
+        return
+
     output_dir = f"{video_name}/segment_analysis"
     os.makedirs(output_dir, exist_ok=True)
 
@@ -69,35 +215,37 @@ def write_result_to_file(segment_id, result, video_name):
     print(f"Result for segment {segment_id} has been written to {filename}")
 
 
-def read_previous_result(segment_id, video_name):
-    previous_id = int(segment_id) - 1
-    filename = os.path.join(f"{video_name}/segment_analysis", f"segment_{previous_id}.json")
+def read_result(segment_id, video_name):
+    store = get_analysis_store(video_name)
+    if store is not None:
+        result = store.read_result(segment_id)
+        if result is not None:
+            return result, store.db_path
+    filename = os.path.join(f"{video_name}/segment_analysis", f"segment_{segment_id}.json")
     if os.path.exists(filename):
         with open(filename, 'r', encoding='utf-8') as f:
             try:
                 return json.load(f), filename
             except json.JSONDecodeError:
-                print(f"Warning: Unable to parse previous result file for segment {previous_id} as JSON.")
+                print(f"Warning: Unable to parse result file for segment {segment_id} as JSON.")
                 return None, None
     return None, None
 
 
-def process_segment(segment: Segment, target_factory: TargetFactory, event_factory: EventFactory, video_name: str, summary_subsection_interval):
-    time.sleep(10)
-    images = segment.get_images()
-    target_features = target_factory.get_fearures()
-    event_features = event_factory.get_event_type_descriptions()
+def read_previous_result(segment_id, video_name):
+    return read_result(int(segment_id) - 1, video_name)
+
 
-    # Read previous segment's result (if any)
-    previous_result, previous_path = read_previous_result(segment.id, video_name=video_name)
+def build_previous_context(segment: Segment, previous_result, target_factory: TargetFactory, event_factory: EventFactory,
+                           summary_subsection_interval):
+    """Render the previous segment's result as (previous_event_str, previous_summary) for the prompt."""
     previous_events = []
-    previous_targets = []
     previous_summary = ""
     if previous_result:
         if segment.id % summary_subsection_interval != 0:
             # Refresh summary every N segments to keep it locally scoped
             previous_summary = previous_result.get("summary")
-        previous_targets = target_factory.create_targets_from_json(previous_path, segement_id=segment.id)
+        previous_targets = target_factory.create_targets_from_data(previous_result, segement_id=segment.id)
         previous_events_json = previous_result.get("events")
         if previous_events_json is not None:
             for previous_event_json in previous_events_json:
@@ -116,31 +264,338 @@ def process_segment(segment: Segment, target_factory: TargetFactory, event_facto
                     ))
 
     previous_event_str = "\n".join([str(event) + "\n" for event in previous_events])
+    return previous_event_str, previous_summary
 
-    sys_prompt = segment_analyze_prompt_v2.SEGEMENT_ANALYZE_SYS_PROMPT
-    user_prompt = segment_analyze_prompt_v2.SEGEMENT_ANALYZE_USER_PROMPT.format(
-        target_config=target_features,
-        event_config=event_features,
+
+def build_budgeted_context(segment: Segment, previous_result, context_builder: ContextBuilder, summary_subsection_interval):
+    """Render the previous context with context_builder and record its size and the str(event) baseline size as metrics."""
+    if not context_builder.has_previous(segment):
+        context_builder.update(int(segment.id) - 1, previous_result)
+    previous_event_str, previous_summary = context_builder.build(segment, summary_subsection_interval)
+    stats = context_builder.last_stats
+    metrics = get_metrics()
+    metrics.observe("context_tokens", stats["tokens"], stage="segment_analysis_v2", segment_id=segment.id)
+    # Separate counters: the saving (baseline - tokens) can be negative, so it is computed at query time
+    metrics.observe("context_baseline_tokens", stats["baseline_tokens"], stage="segment_analysis_v2", segment_id=segment.id)
+    if stats["dropped_events"]:
+        print(f"Segment {segment.id}: dropped {stats['dropped_events']} previous events to fit the context budget")
+    return previous_event_str, previous_summary
+
+
+def build_user_prompt(segment: Segment, target_factory: TargetFactory, event_factory: EventFactory, previous_event_str, previous_summary):
+    return segment_analyze_prompt_v2.SEGEMENT_ANALYZE_USER_PROMPT.format(
+        target_config=target_factory.get_fearures(),
+        event_config=event_factory.get_event_type_descriptions(),
         start_time=segment.start_time,
         previous_events=previous_event_str,
         previous_summary=previous_summary
-    )
-    messages = create_messages(sys_prompt, user_prompt, images)
-    result = get_response(messages)
+    ) + describe_dropped_frames(segment) + describe_mosaics(segment)
+
 
+def parse_result(result, segment_id):
     # Try to parse result as JSON
     try:
         result_json = json.loads(extract_json_from_markdown(result))
-        result_json = add_uuid_to_events(result_json)
+        result_json = add_uuid_to_events(result_json, seed=segment_id)
     except json.JSONDecodeError:
-        print(f"Warning: Unable to parse result as JSON for segment {segment.id}. Storing as plain text.")
+        print(f"Warning: Unable to parse result as JSON for segment {segment_id}. Storing as plain text.")
         result_json = {"raw_text": result}
+    return result_json
+
+
+def segment_fingerprint(segment: Segment, user_prompt, detail=None):
+    # The rendered user prompt already covers configs, start time and the previous context
+    return RunJournal.fingerprint(segment, segment_analyze_prompt_v2.SEGEMENT_ANALYZE_SYS_PROMPT, user_prompt, detail or get_image_detail())
 
+
+def record_outcome(journal, segment_id, fingerprint, result_json):
+    if journal is not None:
+        journal.record(segment_id, RAW_TEXT if "raw_text" in result_json else COMPLETED, fingerprint)
+
+
+def process_segment(segment: Segment, target_factory: TargetFactory, event_factory: EventFactory, video_name: str, summary_subsection_interval, detail=None,
+                    journal: RunJournal = None, resume: bool = False, stream: bool = False, context_builder: ContextBuilder = None):
+    if segment.frame_cache is not None:
+        # The cache collapses repeated frames when they are loaded; load first so the prompt's frame note lists them
+        segment.get_images()
+    if context_builder is not None:
+        # The builder keeps the previous result in memory; disk is only read when starting mid-video
+        previous_result = None
+        if not context_builder.has_previous(segment):
+            previous_result, _ = read_previous_result(segment.id, video_name=video_name)
+        previous_event_str, previous_summary = build_budgeted_context(segment, previous_result, context_builder, summary_subsection_interval)
+    else:
+        # Read previous segment's result (if any)
+        previous_result, _ = read_previous_result(segment.id, video_name=video_name)
+        previous_event_str, previous_summary = build_previous_context(segment, previous_result, target_factory, event_factory, summary_subsection_interval)
+
+    sys_prompt = segment_analyze_prompt_v2.SEGEMENT_ANALYZE_SYS_PROMPT
+    user_prompt = build_user_prompt(segment, target_factory, event_factory, previous_event_str, previous_summary)
+    fingerprint = segment_fingerprint(segment, user_prompt, detail=detail)
+    if resume and journal is not None and journal.is_done(segment.id, fingerprint, video_name):
+        print(f"Skipping segment {segment.id}: already analyzed with unchanged inputs")
+        segment.release_images()
+        result_json = read_result(segment.id, video_name)[0]
+        if context_builder is not None:
+            context_builder.update(segment.id, result_json)
+        return result_json
+
+    try:
+        messages = create_messages(sys_prompt, user_prompt, segment.get_images(), detail=detail)
+        # Streaming records time to first result; the outcome is decided by parsing the complete response
+        on_element = (lambda key, element: None) if stream else None
+        with tagged("segment_analysis_v2", segment.id):
+            result = get_response(messages, on_element=on_element)
+    except Exception as e:
+        if journal is not None:
+            journal.record(segment.id, FAILED, fingerprint, error=str(e))
+        raise
+    finally:
+        segment.release_images()
+
+    result_json = parse_result(result, segment.id)
     write_result_to_file(segment.id, result_json, video_name=video_name)
+    record_outcome(journal, segment.id, fingerprint, result_json)
+    if context_builder is not None:
+        context_builder.update(segment.id, result_json)
+    return result_json
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def _prepare_image_parts(segment: Segment, detail):
+    parts = create_image_parts(segment.get_images(), detail=detail)
+    # The parts keep the encoded strings alive until the request is sent
+    segment.release_images()
+    return parts
+
+
+def _write_and_record(segment_id, result_json, video_name, journal, fingerprint):
+    # Journal only after the file is on disk, so a completed entry always has its result
+    write_result_to_file(segment_id, result_json, video_name)
+    record_outcome(journal, segment_id, fingerprint, result_json)
+
+
+def process_segments_pipelined(segments: List[Segment], target_factory, event_factory, video_name: str, subsection_interval,
+                               detail=None, prefetch: int = 2, read_first_previous: bool = True, resume: bool = False,
+                               journal: RunJournal = None, stream: bool = False, context_builder: ContextBuilder = None):
+    """
+    Serial V2 analysis with all work that does not depend on the previous result overlapped with the model call.
+
+    Frames of the next `prefetch` segments are loaded and encoded in background threads, results are written by a
+    background writer, and the previous result is handed over in memory instead of re-read from disk. Only context
+    rendering and the model call stay on the critical path.
+
+    :param read_first_previous: Whether the first segment continues from the previous segment's file on disk;
+        False starts the chain without previous context
+    :param resume: Skip segments the run journal lists as completed with identical inputs
+    :param journal: Run journal to record outcomes in (default: the video's journal)
+    :param stream: Stream responses and render the next segment's previous-event context while the response
+        arrives, so only the summary remains to be read once it is complete
+    :param context_builder: Render the previous-segment context compactly within a token budget (replaces the
+        streamed str(event) rendering)
+    :return: Total seconds per stage (wait_prepare is time the critical path spent waiting for frames)
+    """
+    timings = defaultdict(float)
+    sys_prompt = segment_analyze_prompt_v2.SEGEMENT_ANALYZE_SYS_PROMPT
+    journal = journal or RunJournal.for_video(video_name)
+    start_all = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max(1, prefetch)) as preparer, ThreadPoolExecutor(max_workers=1) as writer:
+        pending = {}
+        for i in range(min(prefetch, len(segments))):
+            pending[i] = preparer.submit(_timed, _prepare_image_parts, segments[i], detail)
+        writes = []
+        previous_result, previous_id = None, None
+        streamed = None  # StreamedContext of the previous iteration's response
+
+        for i, segment in enumerate(segments):
+            start = time.perf_counter()
+            image_parts, prepare_time = (pending.pop(i) if i in pending else preparer.submit(_timed, _prepare_image_parts, segment, detail)).result()
+            timings["wait_prepare"] += time.perf_counter() - start
+            timings["prepare"] += prepare_time
+            if i + prefetch < len(segments):
+                pending[i + prefetch] = preparer.submit(_timed, _prepare_image_parts, segments[i + prefetch], detail)
+
+            start = time.perf_counter()
+            if i == 0 and not read_first_previous:
+                previous_result = None
+            elif previous_id != int(segment.id) - 1:
+                # Not a continuation of the previous iteration: fall back to the file on disk
+                previous_result, _ = read_previous_result(segment.id, video_name=video_name)
+            if context_builder is not None:
+                context_builder.update(int(segment.id) - 1, previous_result)
+                previous_event_str, previous_summary = build_budgeted_context(segment, previous_result, context_builder, subsection_interval)
+            elif streamed is not None and previous_id == int(segment.id) - 1 and streamed.matches(previous_result):
+                previous_event_str, previous_summary = streamed.previous_context(segment, previous_result, subsection_interval)
+            else:
+                previous_event_str, previous_summary = build_previous_context(segment, previous_result, target_factory, event_factory, subsection_interval)
+            streamed = None
+            user_prompt = build_user_prompt(segment, target_factory, event_factory, previous_event_str, previous_summary)
+            fingerprint = segment_fingerprint(segment, user_prompt, detail=detail)
+            if resume and journal.is_done(segment.id, fingerprint, video_name):
+                print(f"Skipping segment {segment.id}: already analyzed with unchanged inputs")
+                previous_result, previous_id = read_result(segment.id, video_name)[0], int(segment.id)
+                continue
+            messages = create_messages(sys_prompt, user_prompt, None, detail=detail, image_parts=image_parts)
+            timings["context"] += time.perf_counter() - start
+
+            try:
+                on_element = None
+                if stream:
+                    # With a context builder the next context is rendered from the parsed result instead
+                    streamed = StreamedContext(segment.id, target_factory, event_factory) if context_builder is None else None
+                    on_element = streamed.on_element if streamed else (lambda key, element: None)
+                with tagged("segment_analysis_v2", segment.id):
+                    result, call_time = _timed(get_response, messages, on_element=on_element,
+                                               on_reset=streamed.reset if streamed else None)
+            except Exception as e:
+                journal.record(segment.id, FAILED, fingerprint, error=str(e))
+                raise
+            timings["model_call"] += call_time
+            del messages, image_parts
+
+            result_json, parse_time = _timed(parse_result, result, segment.id)
+            timings["parse"] += parse_time
+            writes.append(writer.submit(_timed, _write_and_record, segment.id, result_json, video_name, journal, fingerprint))
+            previous_result, previous_id = result_json, int(segment.id)
+
+        for write in writes:
+            timings["write"] += write.result()[1]
+
+    timings["total"] = time.perf_counter() - start_all
+    print("Pipeline stage totals (s): " + ", ".join(f"{stage}={seconds:.2f}" for stage, seconds in timings.items()))
+    return dict(timings)
+
+
+def split_into_chunks(segments: List[Segment], subsection_interval) -> List[List[Segment]]:
+    """Cut segments at the summary reset points (id % subsection_interval == 0) into independent chains."""
+    chunks = []
+    for segment in segments:
+        if not chunks or int(segment.id) % subsection_interval == 0:
+            chunks.append([])
+        chunks[-1].append(segment)
+    return chunks
+
+
+def _words(text) -> set:
+    return set(re.findall(r"[a-z0-9]+", str(text).lower()))
+
+
+def _event_signature(event: dict, targets_by_id: dict) -> set:
+    """Bag of words describing an event: its description plus the labels and features of its targets."""
+    words = _words(event.get("description", ""))
+    for target_id in event.get("target_ids") or []:
+        target = targets_by_id.get(str(target_id))
+        if target:
+            words |= _words(target.get("label", ""))
+            words |= {f"{key}:{value}".lower() for key, value in (target.get("features") or {}).items()}
+    return words
+
+
+def _similarity(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def stitch_chunk_boundaries(boundary_ids, video_name: str, min_similarity: float = 0.2) -> int:
+    """
+    Link events across chunk boundaries that were analyzed without previous context.
+
+    For each boundary segment, events without a valid cause_event_id are matched one-to-one with still-active
+    events (particularity != 0) of the same type in the preceding segment, by word overlap of descriptions and
+    target labels/features. Matched events get cause_event_id set and the result file is rewritten.
+
+    :param boundary_ids: Ids of the first segment of each chunk (except the first chunk)
+    :param video_name: Output folder holding the results (segment_analysis/segment_{id}.json or the analysis store)
+    :param min_similarity: Minimum Jaccard similarity for a link
+    :return: Number of links added
+    """
+    linked = 0
+    for segment_id in boundary_ids:
+        previous_result, _ = read_previous_result(segment_id, video_name=video_name)
+        current_result, _ = read_result(segment_id, video_name)
+        if not previous_result or not current_result:
+            continue
+
+        previous_events = [e for e in previous_result.get("events") or [] if e.get("particularity") != 0]
+        previous_ids = {e.get("event_id") for e in previous_result.get("events") or []}
+        previous_targets = {str(t.get("id")): t for t in previous_result.get("targets") or []}
+        current_targets = {str(t.get("id")): t for t in current_result.get("targets") or []}
+        unlinked = [e for e in current_result.get("events") or [] if e.get("cause_event_id") not in previous_ids]
+
+        candidates = []
+        for current in unlinked:
+            current_signature = _event_signature(current, current_targets)
+            for previous in previous_events:
+                if previous.get("event_type") != current.get("event_type"):
+                    continue
+                score = _similarity(current_signature, _event_signature(previous, previous_targets))
+                if score >= min_similarity:
+                    candidates.append((score, id(current), current, previous))
+
+        used_current, used_previous = set(), set()
+        for score, _, current, previous in sorted(candidates, key=lambda c: c[0], reverse=True):
+            if id(current) in used_current or previous.get("event_id") in used_previous:
+                continue
+            current["cause_event_id"] = previous.get("event_id")
+            used_current.add(id(current))
+            used_previous.add(previous.get("event_id"))
+
+        if used_current:
+            write_result_to_file(segment_id, current_result, video_name=video_name)
+            linked += len(used_current)
+    return linked
+
+
+def process_segments_chunked(segments: List[Segment], target_factory, event_factory, video_name: str, subsection_interval,
+                             detail=None, max_workers: int = None, prefetch: int = 2, resume: bool = False, stream: bool = False,
+                             context_builder: ContextBuilder = None):
+    """
+    Run V2 analysis as independent chains split at the summary reset points, concurrently, then stitch the boundaries.
+
+    The summary already restarts at every reset point; only the previous-event context is lost there, which
+    stitch_chunk_boundaries restores by linking cause_event_id so StoryPool still joins the storylines.
+
+    :param max_workers: Chunks analyzed at once (default: all)
+    :param context_builder: Compact, token-budgeted previous context; each chunk gets its own builder with this budget
+    :return: Number of cross-chunk links added by stitching
+    """
+    chunks = split_into_chunks(segments, subsection_interval)
+    if not chunks:
+        return 0
+    journal = RunJournal.for_video(video_name)
+    with ThreadPoolExecutor(max_workers=max_workers or len(chunks)) as executor:
+        futures = [
+            executor.submit(process_segments_pipelined, chunk, target_factory, event_factory, video_name,
+                            subsection_interval, detail=detail, prefetch=prefetch, read_first_previous=False, resume=resume,
+                            journal=journal, stream=stream,
+                            context_builder=None if context_builder is None else ContextBuilder(context_builder.token_budget))
+            for chunk in chunks
+        ]
+        for future in futures:
+            future.result()
+
+    linked = stitch_chunk_boundaries([chunk[0].id for chunk in chunks[1:]], video_name)
+    print(f"Analyzed {len(segments)} segments in {len(chunks)} chunks; stitched {linked} events across boundaries")
+    return linked
+
+
+def event_uuid(seed, index, event):
+    return str(uuid.uuid5(uuid.NAMESPACE_OID, f"{seed}:{index}:{json.dumps(event, sort_keys=True, ensure_ascii=False)}"))[:8]
 
 
-def add_uuid_to_events(data):
-    for event in data['events']:
-        short_uuid = str(uuid.uuid4())[:8]
+def add_uuid_to_events(data, seed=None):
+    # A seed (the segment id) makes ids reproducible from the event content, so a cached response yields the
+    # same previous-event context for the next segment (and its prompt hits the cache too), and streamed
+    # events can be given their final id before the response is complete
+    for index, event in enumerate(data['events']):
+        if seed is None:
+            short_uuid = str(uuid.uuid4())[:8]
+        else:
+            short_uuid = event_uuid(seed, index, event)
         event['event_id'] = short_uuid
     return data
@@ -0,0 +1,120 @@
+import json
+import os
+from typing import Dict, List
+from classes.Segment import Segment
+from modules.SegmentAnalyze import build_messages, write_result_to_file
+from utils import ai
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+# Provider limits per input file
+MAX_REQUESTS_PER_FILE = 50000
+MAX_BYTES_PER_FILE = 190 * 1024 * 1024  # below the 200 MB cap to leave room for the last line
+
+
+def segment_custom_id(segment_id) -> str:
+    return f"segment-{segment_id}"
+
+
+def build_batch_request(segment: Segment, event_factory, target_factory, detail=None, model: str = "gpt-4o", temperature: float = 0) -> dict:
+    """One batch input line: the same request SegmentAnalyze.process_segment sends, addressed by custom_id."""
+    return {
+        "custom_id": segment_custom_id(segment.id),
+        "method": "POST",
+        "url": BATCH_ENDPOINT,
+        "body": {
+            "model": model,
+            "temperature": temperature,
+            "messages": build_messages(segment, event_factory, target_factory, detail=detail),
+        },
+    }
+
+
+def write_batch_requests(segments: List[Segment], target_factory, event_factory, output_dir: str, detail=None,
+                         max_requests_per_file: int = MAX_REQUESTS_PER_FILE, max_bytes_per_file: int = MAX_BYTES_PER_FILE) -> List[str]:
+    """
+    Write every segment's analysis request to JSONL batch input files.
+
+    Requests are streamed one segment at a time (images are released after each line) and split into
+    batch_requests_{n}.jsonl files that respect the provider's per-file request and size limits.
+
+    :param segments: Segments to analyze
+    :param target_factory: TargetFactory providing the entity schema
+    :param event_factory: EventFactory providing the event types
+    :param output_dir: Directory for the batch input files
+    :param detail: Image detail level (default: OPENAI_IMAGE_DETAIL)
+    :return: Paths of the written files
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    file, count, size = None, 0, 0
+    try:
+        for segment in segments:
+            line = (json.dumps(build_batch_request(segment, event_factory, target_factory, detail=detail), ensure_ascii=False) + "\n").encode("utf-8")
+            segment.release_images()
+            if file is None or count >= max_requests_per_file or (count and size + len(line) > max_bytes_per_file):
+                if file is not None:
+                    file.close()
+                paths.append(os.path.join(output_dir, f"batch_requests_{len(paths)}.jsonl"))
+                file, count, size = open(paths[-1], "wb"), 0, 0
+            file.write(line)
+            count += 1
+            size += len(line)
+    finally:
+        if file is not None:
+            file.close()
+
+    print(f"Wrote {len(segments)} batch requests to {len(paths)} file(s) in {output_dir}")
+    return paths
+
+
+def submit_batch(requests_path: str, client=None, completion_window: str = "24h") -> str:
+    """Upload a batch input file and start the batch; returns the batch id."""
+    client = client or ai.get_openai_client()
+    with open(requests_path, "rb") as f:
+        input_file = client.files.create(file=f, purpose="batch")
+    batch = client.batches.create(input_file_id=input_file.id, endpoint=BATCH_ENDPOINT, completion_window=completion_window)
+    print(f"Submitted {requests_path} as batch {batch.id}")
+    return batch.id
+
+
+def download_batch_results(batch_id: str, output_path: str, client=None) -> bool:
+    """Save a finished batch's output file; returns False while the batch is not completed yet."""
+    client = client or ai.get_openai_client()
+    batch = client.batches.retrieve(batch_id)
+    if batch.status != "completed":
+        print(f"Batch {batch_id} is {batch.status}")
+        return False
+    with open(output_path, "wb") as f:
+        f.write(client.files.content(batch.output_file_id).read())
+    return True
+
+
+def ingest_batch_results(results_path: str, video_name: str) -> Dict[str, list]:
+    """
+    Write batch output lines to {video_name}/segment_analysis/segment_N.json, the layout fill_segments reads.
+
+    :param results_path: Batch output JSONL (one line per custom_id, in any order)
+    :param video_name: Output folder
+    :return: {"written": [segment ids], "failed": [segment ids]} so failed segments can be resubmitted
+    """
+    outcome = {"written": [], "failed": []}
+    with open(results_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            segment_id = item["custom_id"].split("-", 1)[1]
+            response = item.get("response") or {}
+            try:
+                if item.get("error") or response.get("status_code") != 200:
+                    raise ValueError(item.get("error") or f"status {response.get('status_code')}")
+                result = json.loads(response["body"]["choices"][0]["message"]["content"])
+            except (ValueError, KeyError, IndexError, TypeError) as e:
+                print(f"Error in batch result for segment {segment_id}: {e}")
+                outcome["failed"].append(segment_id)
+                continue
+            write_result_to_file(segment_id, result, video_name)
+            outcome["written"].append(segment_id)
+
+    print(f"Ingested {len(outcome['written'])} segment results, {len(outcome['failed'])} failed")
+    return outcome
@@ -1,15 +1,20 @@
 from typing import List
 from classes.Segment import Segment
+from classes.FrameMosaic import FrameMosaic
+from modules.FrameSelection import select_frames, signature_from_path
 import os
 import re
 
 
-def generate_segments(frames_dir: str, frames_per_segment: int = 20) -> List[Segment]:
+def generate_segments(frames_dir: str, frames_per_segment: int = 20, motion_threshold: float = None,
+                      mosaic: FrameMosaic = None) -> List[Segment]:
     """
     Generate segments from a directory of frames, each containing a fixed number of frames.
 
     :param frames_dir: Path to the video frames directory
     :param frames_per_segment: Number of frames per segment (default: 20)
+    :param motion_threshold: If set, drop frames that differ less than this from the last kept one (see FrameSelection)
+    :param mosaic: Optional FrameMosaic to send each segment's frames as timestamp-labelled grid mosaics
     :return: List of generated Segment objects
     """
     # Ensure the frames directory exists
@@ -39,7 +44,14 @@ def generate_segments(frames_dir: str, frames_per_segment: int = 20) -> List[Seg
         end_time = end_frame / fps
 
         frame_paths = [os.path.join(frames_dir, f) for f in segment_frames]
-        segment = Segment(segment_id, start_time, end_time, frame_paths)
+        frame_times = [int(f.split('frame_')[1].split('.')[0]) / fps for f in segment_frames]
+        segment = Segment(segment_id, start_time, end_time, mosaic=mosaic)
+        kept = range(len(frame_paths))
+        if motion_threshold is not None:
+            kept, dropped = select_frames([signature_from_path(p) for p in frame_paths], threshold=motion_threshold)
+            segment.dropped_frame_times = [frame_times[k] for k in dropped]
+        for k in kept:
+            segment.add_image(frame_paths[k], time=frame_times[k])
         segments.append(segment)
         segment_id += 1
 
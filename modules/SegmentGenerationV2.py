@@ -1,16 +1,63 @@
-from typing import List
+from typing import Iterable, List, Tuple
+from collections import deque
 from classes.Segment import Segment
+from classes.FrameCache import FrameCache
+from classes.FrameManifest import FrameManifest
+from classes.FrameMosaic import FrameMosaic
+from modules.FrameSelection import select_frames, signature_from_path, signature_from_bytes
+import bisect
 import os
 import re
 
 
-def generate_segments(frames_dir: str, frames_per_segment: int = 20, overlap_ratio: float = 0.5) -> List[Segment]:
+def segment_windows(frame_count: int, frames_per_segment: int = 20, overlap_ratio: float = 0.5) -> range:
+    """Start indices of the overlapping frame windows, one per segment."""
+    # Step size according to overlap
+    step = int(frames_per_segment * (1 - overlap_ratio))
+    if step < 1:
+        step = 1
+    return range(0, frame_count - frames_per_segment + 1, step)
+
+
+def _build_segments(frame_paths: List[str], frame_times: List[float], frames_per_segment: int, overlap_ratio: float,
+                    motion_threshold: float = None, frame_cache: FrameCache = None, mosaic: FrameMosaic = None) -> List[Segment]:
+    # Signatures are computed once per frame and shared by overlapping windows
+    signatures = None
+    if motion_threshold is not None:
+        signatures = [signature_from_path(p) for p in frame_paths]
+
+    segments = []
+
+    # Slide window and build segments
+    for segment_id, i in enumerate(segment_windows(len(frame_paths), frames_per_segment, overlap_ratio), start=1):
+        window_paths = frame_paths[i:i + frames_per_segment]
+        window_times = frame_times[i:i + frames_per_segment]
+        start_time = window_times[0]
+        end_time = window_times[-1]
+
+        segment = Segment(segment_id, start_time, end_time, frame_cache=frame_cache, mosaic=mosaic)
+        kept = range(len(window_paths))
+        if signatures is not None:
+            kept, dropped = select_frames(signatures[i:i + frames_per_segment], threshold=motion_threshold)
+            segment.dropped_frame_times = [window_times[k] for k in dropped]
+        for k in kept:
+            segment.add_image(window_paths[k], time=window_times[k])
+        segments.append(segment)
+
+    return segments
+
+
+def generate_segments(frames_dir: str, frames_per_segment: int = 20, overlap_ratio: float = 0.5,
+                      motion_threshold: float = None, frame_cache: FrameCache = None, mosaic: FrameMosaic = None) -> List[Segment]:
     """
     Generate segments from frames with overlap between consecutive segments.
 
     :param frames_dir: Path to the video frames directory
     :param frames_per_segment: Number of frames per segment (default: 20)
     :param overlap_ratio: Ratio of overlapping frames between segments (default: 0.5)
+    :param motion_threshold: If set, drop frames that differ less than this from the last kept one (see FrameSelection)
+    :param frame_cache: Optional FrameCache so overlapping segments share one encoded copy of each frame
+    :param mosaic: Optional FrameMosaic to send each segment's frames as timestamp-labelled grid mosaics
     :return: List of generated Segment objects
     """
     if not os.path.exists(frames_dir):
@@ -19,28 +66,104 @@ def generate_segments(frames_dir: str, frames_per_segment: int = 20, overlap_rat
     frame_files = [f for f in os.listdir(frames_dir) if os.path.isfile(os.path.join(frames_dir, f))]
     frame_files.sort()
 
+    # Compute frame times assuming filename pattern "frame_xxxx" and 30 fps; use a manifest for real timestamps
+    fps = 30
+    frame_times = [int(re.search(r'frame_(\d+)', f).group(1)) / fps for f in frame_files]
+    frame_paths = [os.path.join(frames_dir, f) for f in frame_files]
+
+    return _build_segments(frame_paths, frame_times, frames_per_segment, overlap_ratio, motion_threshold, frame_cache, mosaic)
+
+
+def generate_segments_from_manifest(manifest_path: str, frames_per_segment: int = 20, overlap_ratio: float = 0.5,
+                                    motion_threshold: float = None, frame_cache: FrameCache = None,
+                                    mosaic: FrameMosaic = None) -> List[Segment]:
+    """
+    Generate overlapping segments from a FrameManifest written at extraction time, using real frame timestamps.
+
+    :param manifest_path: Path to the manifest database (see ExtractFrames manifest_path)
+    :param frames_per_segment: Number of frames per segment (default: 20)
+    :param overlap_ratio: Ratio of overlapping frames between segments (default: 0.5)
+    :param motion_threshold: If set, drop frames that differ less than this from the last kept one (see FrameSelection)
+    :param frame_cache: Optional FrameCache so overlapping segments share one encoded copy of each frame
+    :param mosaic: Optional FrameMosaic to send each segment's frames as timestamp-labelled grid mosaics
+    :return: List of generated Segment objects
+    """
+    if not os.path.exists(manifest_path):
+        raise FileNotFoundError(f"Frame manifest not found: {manifest_path}")
+
+    manifest = FrameManifest(manifest_path)
+    records = manifest.get_frames()
+    manifest.close()
+
+    frame_paths = [record[2] for record in records]
+    frame_times = [record[1] for record in records]
+    return _build_segments(frame_paths, frame_times, frames_per_segment, overlap_ratio, motion_threshold, frame_cache, mosaic)
+
+
+def find_segments(segments: List[Segment], start_time: float, end_time: float) -> List[Segment]:
+    """
+    Segments overlapping [start_time, end_time] in O(log n).
+
+    Relies on start and end times both increasing along the list, as produced by the generators in this module.
+    """
+    lo = bisect.bisect_left(segments, start_time, key=lambda segment: segment.end_time)
+    hi = bisect.bisect_right(segments, end_time, key=lambda segment: segment.start_time)
+    return segments[lo:hi]
+
+
+def generate_segments_from_stream(frames: Iterable[Tuple[int, float, bytes]], frames_per_segment: int = 20,
+                                  overlap_ratio: float = 0.5, motion_threshold: float = None,
+                                  frame_cache: FrameCache = None, mosaic: FrameMosaic = None) -> List[Segment]:
+    """
+    Generate overlapping segments directly from a stream of encoded frames, without a frames directory.
+
+    :param frames: Iterable of (frame_number, timestamp_seconds, jpeg_bytes), e.g. ExtractFrames.iter_frames
+    :param frames_per_segment: Number of frames per segment (default: 20)
+    :param overlap_ratio: Ratio of overlapping frames between segments (default: 0.5)
+    :param motion_threshold: If set, drop frames that differ less than this from the last kept one (see FrameSelection)
+    :param frame_cache: Optional FrameCache so overlapping segments share one encoded copy of each frame
+    :param mosaic: Optional FrameMosaic to send each segment's frames as timestamp-labelled grid mosaics
+    :return: List of generated Segment objects
+    """
     segments = []
     segment_id = 1
 
-    # Step size according to overlap
     step = int(frames_per_segment * (1 - overlap_ratio))
     if step < 1:
         step = 1
 
-    # Slide window and build segments
-    for i in range(0, len(frame_files) - frames_per_segment + 1, step):
-        segment_frames = frame_files[i:i + frames_per_segment]
-
-        # Compute start/end time assuming filename pattern "frame_xxxx"
-        start_frame = int(re.search(r'frame_(\d+)', segment_frames[0]).group(1))
-        end_frame = int(re.search(r'frame_(\d+)', segment_frames[-1]).group(1))
-        fps = 30
-        start_time = start_frame / fps
-        end_time = end_frame / fps
-
-        frame_paths = [os.path.join(frames_dir, f) for f in segment_frames]
-        segment = Segment(segment_id, start_time, end_time, frame_paths)
+    window = deque()
+    skip = 0
+
+    for frame in frames:
+        # A step larger than the window skips frames between segments
+        if skip > 0:
+            skip -= 1
+            continue
+
+        frame_number, timestamp, image_bytes = frame
+        signature = signature_from_bytes(image_bytes) if motion_threshold is not None else None
+        window.append((timestamp, image_bytes, signature))
+        if len(window) < frames_per_segment:
+            continue
+
+        start_time = window[0][0]
+        end_time = window[-1][0]
+        segment = Segment(segment_id, start_time, end_time, frame_cache=frame_cache, mosaic=mosaic)
+        if motion_threshold is None:
+            for timestamp, image_bytes, _ in window:
+                segment.add_image_bytes(image_bytes, time=timestamp)
+        else:
+            kept, dropped = select_frames([w[2] for w in window], threshold=motion_threshold)
+            segment.dropped_frame_times = [window[k][0] for k in dropped]
+            for k in kept:
+                segment.add_image_bytes(window[k][1], time=window[k][0])
+            segment.dropped_frame_times.sort()
         segments.append(segment)
         segment_id += 1
 
+        for _ in range(min(step, len(window))):
+            window.popleft()
+        skip = step - frames_per_segment if step > frames_per_segment else 0
+
     return segments
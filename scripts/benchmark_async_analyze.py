@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Run the asyncio analysis engine against the local stand-in server and compare with the rate-limit floor."""
+import argparse
+import glob
+import math
+import os
+import tempfile
+import time
+import cv2
+import numpy as np
+from openai import AsyncOpenAI
+from classes.EventFactory import EventFactory
+from classes.Segment import Segment
+from classes.TargetFactory import TargetFactory
+from modules.SegmentAnalyzeAsync import batch_process_segments_async
+from tools.StandInServer import StandInServer
+
+
+def make_segments(count: int, frames_per_segment: int):
+    frame = cv2.imencode(".jpg", np.zeros((72, 128, 3), dtype=np.uint8))[1].tobytes()
+    segments = []
+    for i in range(1, count + 1):
+        segment = Segment(i, (i - 1) * 5.0, (i - 1) * 5.0 + 10.0)
+        for _ in range(frames_per_segment):
+            segment.add_image_bytes(frame)
+        segments.append(segment)
+    return segments
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--segments", type=int, default=100)
+    parser.add_argument("--rpm", type=int, default=600, help="Stand-in server request limit per minute")
+    parser.add_argument("--latency", type=float, default=2.0, help="Stand-in server latency per call (s)")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--adaptive", action="store_true", help="Do not tell the limiter the RPM; rely on 429s")
+    args = parser.parse_args()
+
+    target_factory = TargetFactory.from_config("accident1/configs/target_factory_config.json")
+    event_factory = EventFactory.from_config("accident1/configs/event_factory_config.json")
+    server = StandInServer(latency=args.latency, requests_per_minute=args.rpm).start()
+    client = AsyncOpenAI(api_key="stand-in", base_url=server.base_url)
+
+    with tempfile.TemporaryDirectory() as video_name:
+        start = time.perf_counter()
+        results = batch_process_segments_async(
+            make_segments(args.segments, 20), target_factory, event_factory, video_name,
+            requests_per_minute=None if args.adaptive else args.rpm, max_concurrency=args.concurrency, client=client)
+        elapsed = time.perf_counter() - start
+        written = len(glob.glob(os.path.join(video_name, "segment_analysis", "segment_*.json")))
+    server.stop()
+
+    # Lower bound: concurrency-limited waves of calls, or one full minute per extra window of the server's RPM
+    floor = max(math.ceil(args.segments / args.concurrency) * args.latency,
+                (math.ceil(args.segments / args.rpm) - 1) * 60 + args.latency)
+    legacy = args.segments * (10 + args.latency)
+    print(f"segments={args.segments} ok={sum(r is not None for r in results)} written={written} "
+          f"429s={server.rate_limited} time={elapsed:.1f}s")
+    print(f"rate-limit floor={floor:.1f}s  sleep(10)+latency serial={legacy:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
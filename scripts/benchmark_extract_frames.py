@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Compare the sparse frame sampler against the decode-every-frame loop it replaced."""
+import argparse
+import os
+import tempfile
+import time
+import cv2
+from functools import partial
+from modules.ExtractFrames import extract_frames, extract_frames_parallel
+
+
+def legacy_extract_frames(video_path: str, output_dir: str, interval: float = 1.0):
+    """Original loop: read() every frame and keep every fps*interval-th one."""
+    os.makedirs(output_dir, exist_ok=True)
+    video = cv2.VideoCapture(video_path)
+    frames_to_skip = max(1, int(video.get(cv2.CAP_PROP_FPS) * interval))
+    frame_count = 0
+    saved_frames = []
+    while True:
+        success, frame = video.read()
+        if not success:
+            break
+        if frame_count % frames_to_skip == 0:
+            output_filename = os.path.join(output_dir, f"frame_{frame_count:06d}.jpg")
+            cv2.imwrite(output_filename, frame)
+            saved_frames.append(output_filename)
+        frame_count += 1
+    video.release()
+    return saved_frames
+
+
+def run(name, fn, video_path, interval):
+    with tempfile.TemporaryDirectory() as output_dir:
+        start = time.perf_counter()
+        paths = fn(video_path, output_dir, interval=interval)
+        elapsed = time.perf_counter() - start
+    names = [os.path.basename(p) for p in paths]
+    print(f"{name:<10} frames={len(names):<6} time={elapsed:.2f}s")
+    return names, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("video_path")
+    parser.add_argument("--interval", type=float, default=0.5)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    legacy_names, legacy_time = run("legacy", legacy_extract_frames, args.video_path, args.interval)
+    sparse_names, sparse_time = run("sparse", extract_frames, args.video_path, args.interval)
+    parallel = partial(extract_frames_parallel, num_workers=args.workers)
+    parallel_names, parallel_time = run("parallel", parallel, args.video_path, args.interval)
+
+    if not (legacy_names == sparse_names == parallel_names):
+        print("WARNING: frame sequences differ")
+    print(f"speedup sparse:   {legacy_time / max(sparse_time, 1e-9):.2f}x")
+    print(f"speedup parallel: {legacy_time / max(parallel_time, 1e-9):.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Time fill_segments over thousands of synthetic segment files (legacy triple parse, single parse, pools, orjson) and the analysis store."""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from classes.AnalysisStore import AnalysisStore
+from classes.EventFactory import EventFactory
+from classes.Segment import Segment
+from classes.TargetFactory import TargetFactory
+from modules import FillSegments
+from modules.FillSegments import fill_segments
+
+WORDS = "the black sedan moves slowly toward the crossing while a pedestrian in a red jacket waits near the curb".split()
+
+
+def sentence(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def write_segment_files(video_name: str, count: int, seed: int = 0):
+    rng = random.Random(seed)
+    os.makedirs(os.path.join(video_name, "segment_analysis"), exist_ok=True)
+    for segment_id in range(1, count + 1):
+        targets = []
+        for i in range(10):
+            if rng.random() < 0.5:
+                targets.append({"id": str(100 + i), "time": segment_id * 5.0, "label": "car",
+                                "features": {"color": rng.choice(["black", "white", "red"]), "type": "sedan",
+                                             "action": sentence(rng, 4), "direction": "north"}})
+            else:
+                targets.append({"id": str(100 + i), "time": segment_id * 5.0, "label": "person",
+                                "features": {"gender": "female", "dress": sentence(rng, 5), "action": sentence(rng, 4)}})
+        events = [{
+            "event_id": f"{segment_id:04d}{i:04d}", "event_type": rng.choice(["traffic", "talking", "accident"]),
+            "start_time": segment_id * 5.0, "target_ids": rng.sample([t["id"] for t in targets], 3),
+            "description": sentence(rng, 100), "cause": sentence(rng, 50), "cause_event_id": "None",
+            "particularity": rng.randint(0, 5), "confidence": "high", "connection": "None", "has_ended": "False",
+        } for i in range(3)]
+        with open(os.path.join(video_name, "segment_analysis", f"segment_{segment_id}.json"), "w", encoding="utf-8") as f:
+            json.dump({"targets": targets, "events": events, "summary": sentence(rng, 120)}, f, ensure_ascii=False, indent=4)
+
+
+def legacy_fill_segments(segments, event_factory, target_factory, video_name):
+    """The previous loader: json.load, then each factory re-opens and re-parses the same file."""
+    for segment in segments:
+        path = f"{video_name}/segment_analysis/segment_{segment.id}.json"
+        with open(path, 'r', encoding='utf-8') as file:
+            segment_data = json.load(file)
+            targets = target_factory.create_targets_from_json(json_file_path=path, segement_id=segment.id)
+            events = event_factory.create_events_from_json(json_file_path=path, target_list=targets, segment_id=segment.id)
+        for event in events:
+            event.current_time = segment.start_time
+        segment.set_summary(segment_data.get("summary", ""))
+        segment.set_targets(targets)
+        segment.set_events(events)
+
+
+def run(name, fn, count, reference=None):
+    segments = [Segment(i, (i - 1) * 5.0, (i - 1) * 5.0 + 10.0) for i in range(1, count + 1)]
+    start = time.perf_counter()
+    fn(segments)
+    elapsed = time.perf_counter() - start
+    events = sum(len(s.events) for s in segments)
+    print(f"{name:<28} {elapsed:7.2f}s  {count / elapsed:8.0f} files/s  events={events}"
+          + (f"  speedup={reference / elapsed:.1f}x" if reference else ""))
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--segments", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    target_factory = TargetFactory.from_config("accident1/configs/target_factory_config.json")
+    event_factory = EventFactory.from_config("accident1/configs/event_factory_config.json")
+
+    with tempfile.TemporaryDirectory() as video_name:
+        write_segment_files(video_name, args.segments)
+        common = (event_factory, target_factory, video_name)
+        legacy = run("legacy (3 parses)", lambda s: legacy_fill_segments(s, *common), args.segments)
+        run("single parse, json", lambda s: fill_segments(s, *common, use_orjson=False), args.segments, legacy)
+        if FillSegments.orjson is not None:
+            run("single parse, orjson", lambda s: fill_segments(s, *common), args.segments, legacy)
+        run(f"threads x{args.workers}", lambda s: fill_segments(s, *common, max_workers=args.workers), args.segments, legacy)
+        run(f"processes x{args.workers}", lambda s: fill_segments(s, *common, max_workers=args.workers, use_processes=True),
+            args.segments, legacy)
+
+        # Same results from the SQLite analysis store instead of one file per segment
+        start = time.perf_counter()
+        AnalysisStore.for_video(video_name).import_directory(video_name)
+        print(f"{'import into analysis store':<28} {time.perf_counter() - start:7.2f}s")
+        os.environ["ANALYSIS_STORE"] = "sqlite"
+        run("analysis store (sqlite)", lambda s: fill_segments(s, *common), args.segments, legacy)
+
+
+if __name__ == "__main__":
+    main()
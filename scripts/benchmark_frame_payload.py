@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""Report per-segment image payload with and without frame preprocessing for a frames directory."""
+import argparse
+import time
+from classes.FrameCache import FrameCache
+from classes.FramePreprocessor import FramePreprocessor
+from modules.SegmentGenerationV2 import generate_segments
+
+
+def measure(name, frames_dir, frame_cache):
+    start = time.perf_counter()
+    segments = generate_segments(frames_dir, frame_cache=frame_cache)
+    payloads = [sum(len(image) for image in segment.get_images()) for segment in segments]
+    elapsed = time.perf_counter() - start
+    average = sum(payloads) / max(len(payloads), 1)
+    print(f"{name:<12} segments={len(segments):<5} avg_bytes={average:,.0f} max_bytes={max(payloads, default=0):,} time={elapsed:.2f}s")
+    return average
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("frames_dir")
+    parser.add_argument("--max-width", type=int, default=1280)
+    parser.add_argument("--max-height", type=int, default=720)
+    parser.add_argument("--quality", type=int, default=80)
+    parser.add_argument("--budget", type=int, default=None, help="Per-segment base64 byte budget")
+    args = parser.parse_args()
+
+    raw = measure("original", args.frames_dir, FrameCache())
+    preprocessor = FramePreprocessor(max_width=args.max_width, max_height=args.max_height,
+                                     jpeg_quality=args.quality, segment_byte_budget=args.budget)
+    processed = measure("preprocessed", args.frames_dir, FrameCache(preprocessor=preprocessor))
+    print(f"payload ratio: {processed / max(raw, 1):.2f}")
+
+
+if __name__ == "__main__":
+    main()
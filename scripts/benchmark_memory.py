@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""Measure per-object memory of the __slots__ model classes against dict-backed equivalents."""
+import argparse
+import tracemalloc
+from classes.TargetFactory import Target
+from classes.EventFactory import Event
+from classes.Segment import Segment
+from classes.StoryTree import StoryNode
+
+
+def dict_backed(cls):
+    """Rebuild a class without __slots__, i.e. the plain dict-backed layout the classes used to have."""
+    namespace = {k: v for k, v in cls.__dict__.items() if k != "__slots__" and k not in cls.__slots__}
+    return type(f"Dict{cls.__name__}", (), namespace)
+
+
+def make_target(cls, i):
+    return cls(id=str(100 + i % 15), label="car", features={"color": "black"}, time=float(i), parent_segment_id=i // 15)
+
+
+def make_event(cls, i):
+    return cls(event_id=f"{i:08x}", event_type="traffic", start_time=float(i), current_time=float(i), target_ids=["100"],
+               description="car moving", particularity=i % 6, cause="moving", cause_event_id="None", parent_segment_id=i // 3)
+
+
+def make_segment(cls, i):
+    return cls(i, i * 5.0, i * 5.0 + 10.0)
+
+
+def make_node(cls, i, event=make_event(Event, 0)):
+    return cls(event)
+
+
+def measure(factory, cls, count):
+    tracemalloc.start()
+    objects = [factory(cls, i) for i in range(count)]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return current / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=200_000)
+    args = parser.parse_args()
+
+    print(f"{'class':<10} {'dict B/obj':>11} {'slots B/obj':>12} {'saved':>7}")
+    for cls, factory in [(Target, make_target), (Event, make_event), (Segment, make_segment), (StoryNode, make_node)]:
+        legacy = measure(factory, dict_backed(cls), args.count)
+        compact = measure(factory, cls, args.count)
+        print(f"{cls.__name__:<10} {legacy:>11.0f} {compact:>12.0f} {1 - compact / legacy:>7.0%}")
+
+
+if __name__ == "__main__":
+    main()
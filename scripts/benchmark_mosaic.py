@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""Compare per-frame and mosaic requests for a frames directory: images, request bytes, image tokens and latency."""
+import argparse
+import json
+import time
+from classes.FrameMosaic import FrameMosaic
+from modules.SegmentGenerationV2 import generate_segments
+from modules.SegmentAnalyzeV2 import create_messages, get_response
+from utils.ratelimit import estimate_image_tokens
+
+
+def measure(name, frames_dir, mosaic, calls):
+    segments = generate_segments(frames_dir, mosaic=mosaic)
+    start = time.perf_counter()
+    requests = []
+    for segment in segments:
+        requests.append(create_messages("", "Describe the frames.", segment.get_images()))
+        segment.release_images()
+    build_time = time.perf_counter() - start
+
+    images = [sum(part["type"] == "image_url" for part in r[1]["content"]) for r in requests]
+    sizes = [len(json.dumps(r)) for r in requests]
+    tokens = [estimate_image_tokens(r) for r in requests]
+    latencies = []
+    for messages in requests[:calls]:
+        start = time.perf_counter()
+        get_response(messages)
+        latencies.append(time.perf_counter() - start)
+
+    count = max(len(requests), 1)
+    line = (f"{name:<10} segments={len(segments):<4} images/request={sum(images) / count:.1f} "
+            f"avg_request_bytes={sum(sizes) / count:,.0f} image_tokens/request={sum(tokens) / count:,.0f} "
+            f"build={build_time:.2f}s")
+    if latencies:
+        line += f" latency_avg={sum(latencies) / len(latencies):.2f}s"
+    print(line)
+    return sum(sizes) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("frames_dir")
+    parser.add_argument("--columns", type=int, default=2)
+    parser.add_argument("--rows", type=int, default=2)
+    parser.add_argument("--tile-width", type=int, default=640)
+    parser.add_argument("--quality", type=int, default=85)
+    parser.add_argument("--calls", type=int, default=0,
+                        help="Segments to send to the configured backend per mode to measure latency (AI_BACKEND)")
+    args = parser.parse_args()
+
+    per_frame = measure("per-frame", args.frames_dir, None, args.calls)
+    mosaic = FrameMosaic(columns=args.columns, rows=args.rows, tile_width=args.tile_width, jpeg_quality=args.quality)
+    tiled = measure("mosaic", args.frames_dir, mosaic, args.calls)
+    # Second pass reads the mosaics cached next to the frames
+    measure("cached", args.frames_dir, mosaic, 0)
+    print(f"request bytes ratio: {tiled / max(per_frame, 1):.2f}  mosaic cache: {mosaic.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Scaling of target/event binding and lookups: list scans vs the hash-indexed Registry, for growing targets per segment."""
+import argparse
+import random
+import time
+from classes.EventFactory import EventFactory
+from classes.Registry import Registry
+from classes.Segment import Segment
+from classes.TargetFactory import TargetFactory
+
+
+def make_segment_data(rng, targets_per_segment: int, events_per_segment: int, targets_per_event: int):
+    targets = [{"id": str(100 + i), "label": rng.choice(["car", "person"]), "time": 0,
+                "features": {"color": "black", "type": "sedan", "gender": "male", "dress": "coat", "action": "walking"}}
+               for i in range(targets_per_segment)]
+    events = [{"event_id": f"{rng.getrandbits(32):08x}", "event_type": "traffic", "start_time": 0.0,
+               "target_ids": rng.sample([t["id"] for t in targets], min(targets_per_event, len(targets))),
+               "description": "", "particularity": 1, "cause": "", "cause_event_id": "None"}
+              for _ in range(events_per_segment)]
+    return {"targets": targets, "events": events, "summary": ""}
+
+
+def legacy_bind(event_factory, data, segment_id, target_list):
+    """The previous binding: every event scans every target against its target_ids list."""
+    events = event_factory.create_events_from_data({"events": data["events"]}, segment_id)
+    for event, event_data in zip(events, data["events"]):
+        matching_targets = [target for target in target_list if target.get_id() in event_data['target_ids']]
+        for target in matching_targets:
+            target.parent_event_id = event_data['event_id']
+        event.set_targets(matching_targets)
+    return events
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--segments", type=int, default=100)
+    parser.add_argument("--targets", type=int, nargs="+", default=[50, 200, 800])
+    parser.add_argument("--targets-per-event", type=int, default=20)
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+
+    target_factory = TargetFactory.from_config("accident1/configs/target_factory_config.json")
+    event_factory = EventFactory.from_config("accident1/configs/event_factory_config.json")
+    rng = random.Random(0)
+
+    for targets_per_segment in args.targets:
+        events_per_segment = max(3, targets_per_segment // 4)
+        datas = [make_segment_data(rng, targets_per_segment, events_per_segment, args.targets_per_event)
+                 for _ in range(args.segments)]
+        segments = [Segment(i, i * 5.0, i * 5.0 + 10.0) for i in range(1, args.segments + 1)]
+        target_lists = [target_factory.create_targets_from_data(d, segement_id=s.id) for d, s in zip(datas, segments)]
+
+        _, legacy_time = timed(lambda: [legacy_bind(event_factory, d, s.id, t) for d, s, t in zip(datas, segments, target_lists)])
+        events, indexed_time = timed(lambda: [event_factory.create_events_from_data(d, s.id, t)
+                                              for d, s, t in zip(datas, segments, target_lists)])
+        for segment, targets, segment_events in zip(segments, target_lists, events):
+            segment.set_targets(targets)
+            segment.set_events(segment_events)
+        registry, build_time = timed(lambda: Registry.from_segments(segments))
+
+        # Random lookups: event by segment and id, and events a target takes part in
+        probes = [(rng.choice(segments), rng.randrange(targets_per_segment)) for _ in range(args.lookups)]
+        event_ids = [rng.choice(s.events).id for s, _ in probes]
+        _, scan_time = timed(lambda: [
+            (next(e for seg in segments if seg.id == s.id for e in seg.events if e.id == event_id),
+             [e for e in s.events if str(100 + t) in e.target_ids])
+            for event_id, (s, t) in zip(event_ids, probes)])
+        _, lookup_time = timed(lambda: [
+            (registry.get_event(s.id, event_id), registry.get_events_for_target(s.id, 100 + t))
+            for event_id, (s, t) in zip(event_ids, probes)])
+
+        print(f"targets/segment={targets_per_segment:<5} events/segment={events_per_segment:<4} "
+              f"bind: scan={legacy_time:.3f}s indexed={indexed_time:.3f}s ({legacy_time / indexed_time:.0f}x)  "
+              f"registry build={build_time:.3f}s  "
+              f"{args.lookups} lookups: scan={scan_time:.3f}s registry={lookup_time:.4f}s ({scan_time / lookup_time:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
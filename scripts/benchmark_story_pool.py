@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Live-feed storyline upkeep: rebuilding StoryPool after every new segment vs StoryPool.append_segment."""
+import argparse
+import random
+import time
+from classes.EventFactory import Event
+from classes.Registry import Registry
+from classes.Segment import Segment
+from classes.StoryTree import StoryPool
+
+
+class StructurePool(StoryPool):
+    """Storylines only: summaries are LLM calls and would dominate both timings."""
+
+    def generate_summaries(self):
+        pass
+
+
+def make_segments(count: int, events_per_segment: int, seed: int = 0):
+    rng = random.Random(seed)
+    segments, previous_ids = [], []
+    for segment_id in range(1, count + 1):
+        segment = Segment(segment_id, segment_id * 5.0, segment_id * 5.0 + 10.0)
+        events = []
+        for i in range(events_per_segment):
+            # Most events continue one of the previous segment's events, several of them the same one (branches)
+            cause = rng.choice(previous_ids) if previous_ids and rng.random() < 0.8 else "None"
+            events.append(Event(f"{segment_id:05d}{i:04d}", "traffic", segment_id * 5.0, segment_id * 5.0, [], "",
+                                rng.randint(0, 5), "", cause, segment_id))
+        segment.set_targets([])
+        segment.set_events(events)
+        segments.append(segment)
+        previous_ids = [event.id for event in events]
+    return segments
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--segments", type=int, default=150)
+    parser.add_argument("--events", type=int, nargs="+", default=[10, 50, 200])
+    args = parser.parse_args()
+
+    for events_per_segment in args.events:
+        segments = make_segments(args.segments, events_per_segment)
+        registry = Registry.from_segments(segments)
+
+        start = time.perf_counter()
+        for count in range(1, len(segments) + 1):
+            rebuilt = StructurePool(segments[:count], registry=registry)
+        rebuild_time = time.perf_counter() - start
+
+        pool = StructurePool([], registry=registry)
+        start = time.perf_counter()
+        for segment in segments:
+            pool.append_segment(segment)
+        append_time = time.perf_counter() - start
+
+        same = all(a.cumulative_particularity == b.cumulative_particularity and a.height == b.height
+                   for roots_a, roots_b in zip(pool.roots.values(), rebuilt.roots.values())
+                   for a, b in zip(roots_a, roots_b))
+        print(f"events/segment={events_per_segment:<4} {args.segments} segments: "
+              f"rebuild each time={rebuild_time:.2f}s  append_segment={append_time:.3f}s "
+              f"({append_time / args.segments * 1000:.2f} ms/segment, {rebuild_time / append_time:.0f}x)  same trees={same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""Round-trip check of the analysis store: results with non-string ids and values read back exactly as written."""
+import argparse
+import glob
+import json
+import os
+import sys
+import tempfile
+from classes.AnalysisStore import AnalysisStore
+from classes.EventFactory import EventFactory
+from classes.TargetFactory import TargetFactory
+
+CASES = {
+    # Integer target ids referenced by integer target_ids: event -> target binding depends on the exact type
+    1: {"targets": [{"id": 1, "label": "car", "time": 5, "features": {"color": "black", "type": "sedan"}},
+                    {"id": "2", "label": "person", "features": {"gender": "male", "dress": "coat", "action": "walking"}}],
+        "events": [{"event_id": 7, "event_type": "traffic", "start_time": 5, "target_ids": [1, "2"], "description": "d",
+                    "cause": "None", "cause_event_id": None, "particularity": "3", "has_ended": False}],
+        "summary": "s", "note": {"nested": [1, 2.5]}},
+    2: {"raw_text": "not json {"},
+    3: {"targets": [], "events": []},
+    4: {"summary": None, "events": [{"event_id": "a", "event_type": "traffic", "start_time": "12.5", "target_ids": [],
+                                     "description": "", "cause": "", "cause_event_id": "None", "particularity": 2.5}]},
+}
+
+
+def bound_targets(result: dict, target_factory, event_factory):
+    targets = target_factory.create_targets_from_data(result, segement_id=1)
+    events = event_factory.create_events_from_data(result, segment_id=1, target_list=targets)
+    return [len(event.targets) for event in events]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("video_name", nargs="?", default=None, help="Also round-trip this video's segment_analysis/ files")
+    args = parser.parse_args()
+
+    target_factory = TargetFactory.from_config("accident1/configs/target_factory_config.json")
+    event_factory = EventFactory.from_config("accident1/configs/event_factory_config.json")
+    failures = 0
+    with tempfile.TemporaryDirectory() as directory:
+        store = AnalysisStore(os.path.join(directory, "analysis.db"))
+        cases = dict(CASES)
+        if args.video_name:
+            for path in glob.glob(os.path.join(args.video_name, "segment_analysis", "segment_*.json")):
+                with open(path, encoding="utf-8") as f:
+                    cases[1000 + int(os.path.basename(path)[len("segment_"):-len(".json")])] = json.load(f)
+        for segment_id, result in cases.items():
+            store.write_result(segment_id, result)
+        for segment_id, result in cases.items():
+            read = store.read_result(segment_id)
+            if read != result:
+                failures += 1
+                print(f"segment {segment_id}: wrote {result!r}\n  read {read!r}")
+        read = store.read_result(1)
+        if bound_targets(read, target_factory, event_factory) != bound_targets(CASES[1], target_factory, event_factory):
+            failures += 1
+            print("segment 1: events bind different targets after the round trip")
+        store.close()
+    print(f"{len(cases)} results, {failures} mismatches")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
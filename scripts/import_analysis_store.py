@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+"""Import a video's segment_analysis/segment_N.json files into its SQLite analysis store ({video_name}/analysis.db)."""
+import argparse
+from classes.AnalysisStore import AnalysisStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("video_name", help="Folder holding segment_analysis/")
+    parser.add_argument("--db", default=None, help="Store path (default: {video_name}/analysis.db)")
+    args = parser.parse_args()
+
+    store = AnalysisStore(args.db) if args.db else AnalysisStore.for_video(args.video_name)
+    imported = store.import_directory(args.video_name)
+    print(f"Imported {imported} segments into {store.db_path} ({len(store)} stored)")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,62 @@
 #!/usr/bin/env python3
+import json
 import os
 from glob import glob
 from classes.TargetFactory import TargetFactory
 from classes.EventFactory import EventFactory
 from classes.Segment import Segment
+from classes.FrameManifest import FrameManifest, DEFAULT_MANIFEST_NAME
+from classes.AnalysisStore import get_analysis_store
+from modules.SegmentGenerationV2 import segment_windows
 from modules.FillSegments import fill_segments
+from classes.Registry import Registry
 from classes.StoryTree import StoryPool
-from modules.Load import load_stories, load_targets, load_segments, load_events
+from modules.EntityResolution import resolve_tracks
+from modules.Load import load_stories, load_tracks, load_segments, load_events
 from classes.VectorStore import VectorStore
 from classes.RAGAgent import Agent
+from utils.ai import get_backend
+from utils.metrics import get_metrics
+
+
+def load_segment_times(folder: str, frames_per_segment: int = 20, overlap_ratio: float = 0.5):
+    """Map segment id -> (start, end) from the frame manifest, if one was written at extraction time."""
+    manifest_path = os.path.join(folder, DEFAULT_MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return {}
+    manifest = FrameManifest(manifest_path)
+    frame_times = [record[1] for record in manifest.get_frames()]
+    manifest.close()
+    return {
+        seg_id: (frame_times[i], frame_times[i + frames_per_segment - 1])
+        for seg_id, i in enumerate(segment_windows(len(frame_times), frames_per_segment, overlap_ratio), start=1)
+    }
 
 
 def build_segments_from_json(folder: str):
-    """Create Segment objects inferred from existing segment JSON files."""
-    files = sorted(glob(os.path.join(folder, "segment_analysis", "segment_*.json")))
+    """Create Segment objects inferred from existing segment JSON files (and the analysis store, when enabled)."""
+    files = glob(os.path.join(folder, "segment_analysis", "segment_*.json"))
+    seg_ids = {int(os.path.basename(path).split("_")[1].split(".")[0]) for path in files}
+    store = get_analysis_store(folder)
+    if store is not None:
+        seg_ids.update(store.get_segment_ids())
+    segment_times = load_segment_times(folder)
     segments = []
-    for path in files:
-        name = os.path.basename(path)
-        seg_id = int(name.split("_")[1].split(".")[0])
-        # assume 10 seconds per segment for demo
-        start_time = (seg_id - 1) * 10
-        end_time = start_time + 10
+    for seg_id in sorted(seg_ids):
+        if seg_id in segment_times:
+            start_time, end_time = segment_times[seg_id]
+        else:
+            # no manifest: assume 10 seconds per segment for demo
+            start_time = (seg_id - 1) * 10
+            end_time = start_time + 10
         segments.append(Segment(seg_id, start_time, end_time, image_paths=None))
     return segments
 
 
 def main():
     api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise RuntimeError("OPENAI_API_KEY is not set. Please export your API key.")
+    if not api_key and get_backend() == "openai":
+        raise RuntimeError("OPENAI_API_KEY is not set. Please export your API key (or set AI_BACKEND=local).")
 
     base = os.path.dirname(os.path.dirname(__file__))
     video_name = os.path.join(base, "accident1")
@@ -38,17 +66,21 @@ def main():
 
     segments = build_segments_from_json(video_name)
     if not segments:
-        raise RuntimeError("No segment JSON files found under accident1/segment_analysis")
+        raise RuntimeError("No segment results found under accident1/segment_analysis or in accident1/analysis.db")
 
-    fill_segments(segments=segments, event_factory=event_factory, target_factory=target_factory, video_name=video_name)
+    # Target/event index shared by the storyline pool and the agent
+    registry = Registry()
+    fill_segments(segments=segments, event_factory=event_factory, target_factory=target_factory, video_name=video_name,
+                  registry=registry)
 
     # Build storyline pool
-    story_pool = StoryPool(segments)
+    story_pool = StoryPool(segments, registry=registry)
 
     # Build docs
     story_docs = load_stories(story_pool, use_summary=True)
     event_docs = load_events(segments)
-    target_docs = load_targets(segments)
+    # One document per entity track rather than per target copy in each overlapping segment
+    target_docs = load_tracks(resolve_tracks(segments, registry=registry))
     segment_docs = load_segments(segments)
 
     # Vector store
@@ -61,6 +93,10 @@ def main():
     res = agent.search(query="traffic accident near the intersection", mode="storyline", labels="car, accident")
     print(res)
 
+    # Per-stage LLM usage of this run (story summaries and agent calls)
+    print("\n=== LLM usage by stage ===")
+    print(json.dumps(get_metrics().summary(), indent=2))
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,59 @@
+import argparse
+import json
+import os
+import time
+
+
+def answer_batch_file(requests_path: str, results_path: str, responses_dir: str = "accident1/segment_analysis",
+                      fail_ids=()) -> int:
+    """
+    Answer a batch input file offline, writing output lines in the provider's batch output format.
+
+    Each request is answered with the recorded analysis of the same segment (segment_N.json in responses_dir),
+    or round-robin from the recorded analyses for unknown segments.
+
+    :param fail_ids: Segment ids to answer with an error line, to exercise failure handling
+    :return: Number of requests answered
+    """
+    recorded = {}
+    for name in sorted(os.listdir(responses_dir)):
+        if name.startswith("segment_") and name.endswith(".json"):
+            with open(os.path.join(responses_dir, name), encoding="utf-8") as f:
+                recorded[name[len("segment_"):-len(".json")]] = f.read()
+    fallback = list(recorded.values()) or ["{}"]
+    fail_ids = {str(segment_id) for segment_id in fail_ids}
+
+    count = 0
+    with open(requests_path, "r", encoding="utf-8") as requests, open(results_path, "w", encoding="utf-8") as results:
+        for line in requests:
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            segment_id = request["custom_id"].split("-", 1)[1]
+            output = {"id": f"batch_req_standin_{count}", "custom_id": request["custom_id"], "response": None, "error": None}
+            if segment_id in fail_ids:
+                output["error"] = {"code": "server_error", "message": "Stand-in failure"}
+            else:
+                content = recorded.get(segment_id, fallback[count % len(fallback)])
+                prompt_chars = len(json.dumps(request["body"]["messages"]))
+                output["response"] = {"status_code": 200, "request_id": f"standin-{count}", "body": {
+                    "id": f"chatcmpl-standin-{count}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request["body"].get("model", "stand-in"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": prompt_chars // 4, "completion_tokens": len(content) // 4,
+                              "total_tokens": (prompt_chars + len(content)) // 4},
+                }}
+            results.write(json.dumps(output, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer a batch input JSONL offline with recorded segment analyses.")
+    parser.add_argument("requests_path")
+    parser.add_argument("results_path")
+    parser.add_argument("--responses-dir", default="accident1/segment_analysis")
+    args = parser.parse_args()
+    print(f"Answered {answer_batch_file(args.requests_path, args.results_path, args.responses_dir)} requests")
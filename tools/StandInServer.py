@@ -0,0 +1,129 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from glob import glob
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+class StandInServer:
+    """
+    Local OpenAI-compatible chat completions endpoint for offline load tests.
+
+    Replays recorded segment analyses, adds a fixed latency and enforces a requests-per-minute
+    limit with 429 + retry-after responses like the real API.
+    """
+
+    def __init__(self, responses_dir: str = "accident1/segment_analysis", latency: float = 0.5,
+                 requests_per_minute: Optional[int] = None, host: str = "127.0.0.1", port: int = 0):
+        self.responses = [open(path, encoding="utf-8").read()
+                          for path in sorted(glob(os.path.join(responses_dir, "segment_*.json")))] or ["{}"]
+        self.latency = latency
+        self.requests_per_minute = requests_per_minute
+        self.request_times = deque()  # accepted request times within the last minute
+        self.lock = threading.Lock()
+        self.served = 0
+        self.rate_limited = 0
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> 'StandInServer':
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _admit(self):
+        """Return (admitted, retry_after_seconds, remaining_requests) under the sliding one-minute window."""
+        with self.lock:
+            now = time.monotonic()
+            while self.request_times and now - self.request_times[0] >= 60:
+                self.request_times.popleft()
+            if self.requests_per_minute is not None and len(self.request_times) >= self.requests_per_minute:
+                self.rate_limited += 1
+                return False, 60 - (now - self.request_times[0]), 0
+            self.request_times.append(now)
+            self.served += 1
+            remaining = None if self.requests_per_minute is None else self.requests_per_minute - len(self.request_times)
+            return True, 0.0, remaining
+
+    def _completion(self, body: dict) -> dict:
+        content = self.responses[self.served % len(self.responses)]
+        prompt_chars = len(json.dumps(body.get("messages", [])))
+        return {
+            "id": f"chatcmpl-standin-{self.served}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stand-in"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_chars // 4, "completion_tokens": len(content) // 4,
+                      "total_tokens": (prompt_chars + len(content)) // 4},
+        }
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if not self.path.endswith("/chat/completions"):
+                    self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+                    return
+
+                admitted, retry_after, remaining = server._admit()
+                if not admitted:
+                    self._send(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                               {"retry-after-ms": str(int(retry_after * 1000))})
+                    return
+
+                headers = {} if remaining is None else {"x-ratelimit-remaining-requests": str(remaining)}
+                if body.get("stream"):
+                    self._stream(server._completion(body), headers)
+                    return
+                time.sleep(server.latency)
+                self._send(200, server._completion(body), headers)
+
+            def _stream(self, completion, headers):
+                """Server-sent events: first chunk after a fifth of the latency, the rest spread over the chunks."""
+                content = completion["choices"][0]["message"]["content"]
+                pieces = [content[i:i + 64] for i in range(0, len(content), 64)] or [""]
+                base = {key: completion[key] for key in ("id", "created", "model")}
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                time.sleep(server.latency * 0.2)
+                for piece in pieces:
+                    chunk = {**base, "object": "chat.completion.chunk",
+                             "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                    time.sleep(server.latency * 0.8 / len(pieces))
+                usage = {**base, "object": "chat.completion.chunk", "choices": [], "usage": completion["usage"]}
+                self.wfile.write(f"data: {json.dumps(usage)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+
+            def _send(self, status, payload, headers=None):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
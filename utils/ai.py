@@ -1,8 +1,19 @@
 import os
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 
 
+BACKENDS = ("openai", "local")
+
+
+def get_backend() -> str:
+    """Return the model backend selected by AI_BACKEND: "openai" (default) or "local" (offline stand-in, utils/local_backend.py)."""
+    backend = os.getenv("AI_BACKEND", "openai")
+    if backend not in BACKENDS:
+        raise RuntimeError(f"Invalid AI_BACKEND: {backend}. Expected one of: {', '.join(BACKENDS)}.")
+    return backend
+
+
 def _get_api_key() -> str:
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
@@ -10,17 +21,42 @@ def _get_api_key() -> str:
     return api_key
 
 
+def get_image_detail() -> str:
+    """Return the image detail level sent with frames, configurable per deployment via OPENAI_IMAGE_DETAIL."""
+    detail = os.getenv("OPENAI_IMAGE_DETAIL", "high")
+    if detail not in ("low", "high", "auto"):
+        raise RuntimeError(f"Invalid OPENAI_IMAGE_DETAIL: {detail}. Expected one of: low, high, auto.")
+    return detail
+
+
 def get_openai_client() -> OpenAI:
     """Return OpenAI client initialized from environment."""
+    if get_backend() == "local":
+        from utils.local_backend import LocalOpenAI
+        return LocalOpenAI()
     return OpenAI(api_key=_get_api_key())
 
 
+def get_async_openai_client(**kwargs) -> AsyncOpenAI:
+    """Return AsyncOpenAI client initialized from environment; kwargs are passed through (e.g. max_retries)."""
+    if get_backend() == "local":
+        from utils.local_backend import AsyncLocalOpenAI
+        return AsyncLocalOpenAI()
+    return AsyncOpenAI(api_key=_get_api_key(), **kwargs)
+
+
 def get_chat_model(model: str = "gpt-4o", temperature: float = 0.5) -> ChatOpenAI:
     """Return LangChain ChatOpenAI client from environment settings."""
+    if get_backend() == "local":
+        from utils.local_backend import LocalChatModel
+        return LocalChatModel()
     return ChatOpenAI(model=model, temperature=temperature, api_key=_get_api_key())
 
 
 def get_embeddings() -> OpenAIEmbeddings:
     """Return OpenAIEmbeddings initialized from environment."""
+    if get_backend() == "local":
+        from utils.local_backend import HashEmbeddings
+        return HashEmbeddings()
     return OpenAIEmbeddings(api_key=_get_api_key())
 
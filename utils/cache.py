@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+from utils.metrics import get_metrics
+
+
+def _digest_images(messages):
+    """Copy of messages with inline image data replaced by its sha256, so keys stay small and stable."""
+    digested = []
+    for message in messages:
+        content = message["content"]
+        if not isinstance(content, str):
+            parts = []
+            for part in content:
+                if part.get("type") == "image_url":
+                    url = part["image_url"]["url"]
+                    part = {"type": "image_url", "image_url": {
+                        **part["image_url"], "url": "sha256:" + hashlib.sha256(url.encode("utf-8")).hexdigest()}}
+                parts.append(part)
+            content = parts
+        digested.append({**message, "content": content})
+    return digested
+
+
+class ResponseCache:
+    """On-disk LLM response cache keyed by model, temperature and messages, evicting least recently used entries."""
+
+    def __init__(self, cache_dir: str, max_bytes: Optional[int] = None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes  # None keeps every entry
+        self.entries = OrderedDict()  # key -> size in bytes, least recently used first
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # Rebuild the LRU order from file modification times (touched on every hit)
+        existing = []
+        for name in os.listdir(cache_dir):
+            if name.endswith(".json"):
+                stat = os.stat(os.path.join(cache_dir, name))
+                existing.append((stat.st_mtime, name[:-5], stat.st_size))
+        for _, key, size in sorted(existing):
+            self.entries[key] = size
+            self.total_bytes += size
+
+    @classmethod
+    def from_env(cls) -> Optional['ResponseCache']:
+        """Build a cache from LLM_CACHE_DIR / LLM_CACHE_MAX_MB; None when LLM_CACHE_DIR is unset."""
+        cache_dir = os.getenv("LLM_CACHE_DIR")
+        if not cache_dir:
+            return None
+        max_mb = os.getenv("LLM_CACHE_MAX_MB")
+        return cls(cache_dir, int(float(max_mb) * 1024 * 1024) if max_mb else None)
+
+    @staticmethod
+    def make_key(model: str, temperature: float, messages) -> str:
+        payload = json.dumps({"model": model, "temperature": temperature, "messages": _digest_images(messages)},
+                             sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[str]:
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+            try:
+                with open(self._path(key), "r", encoding="utf-8") as f:
+                    content = json.load(f)["content"]
+                os.utime(self._path(key))
+            except (OSError, ValueError, KeyError):
+                self.total_bytes -= self.entries.pop(key)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return content
+
+    def put(self, key: str, content: str):
+        data = json.dumps({"content": content, "created": time.time()}, ensure_ascii=False).encode("utf-8")
+        with self.lock:
+            tmp_path = f"{self._path(key)}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+            self.total_bytes += len(data) - self.entries.pop(key, 0)
+            self.entries[key] = len(data)
+            self._evict()
+
+    def _evict(self):
+        while self.max_bytes is not None and self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            key, size = self.entries.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Process-wide cache configured from the environment (None when caching is disabled)."""
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache.from_env() or False
+    return _response_cache or None
+
+
+def cached_response(model: str, temperature: float, messages, fetch: Callable[[], str],
+                    validate: Optional[Callable[[str], bool]] = None) -> str:
+    """
+    Return the cached completion text for this request, or call fetch() and cache its result.
+
+    :param model: Model name sent with the request
+    :param temperature: Sampling temperature sent with the request
+    :param messages: Chat messages; inline images are keyed by digest
+    :param fetch: Performs the request and returns the completion text
+    :param validate: Only content for which validate(content) is true is cached or served from the cache, so a
+        response the caller cannot use (e.g. unparseable JSON) is requested again when the segment is redone
+    """
+    cache = get_response_cache()
+    if cache is None:
+        return fetch()
+    key = cache.make_key(model, temperature, messages)
+    content = cache.get(key)
+    if content is not None and (validate is None or validate(content)):
+        get_metrics().record(model=model, cached=True)
+    else:
+        content = fetch()
+        if validate is None or validate(content):
+            cache.put(key, content)
+    return content
+
+
+def is_json(content: str) -> bool:
+    try:
+        json.loads(content)
+        return True
+    except (TypeError, ValueError):
+        return False
@@ -0,0 +1,78 @@
+import json
+from typing import Iterable, List, Tuple
+
+
+class IncrementalJsonParser:
+    """
+    Incremental parser for a streamed JSON object that emits the elements of selected top-level arrays
+    as soon as each one is complete.
+
+    Text before the first "{" (e.g. a Markdown fence) is skipped. Each character is scanned once to track
+    element boundaries; complete elements are decoded with json.loads.
+
+    Example: feeding '{"targets": [{"id": "100"}, {"id": "101"}], "events": [...' emits
+    ("targets", {"id": "100"}) and ("targets", {"id": "101"}) before the events arrive.
+    """
+
+    def __init__(self, keys: Iterable[str] = ("targets", "events")):
+        self.keys = set(keys)
+        self.text = ""  # all text received so far
+        self.position = 0  # next character to scan
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.string_start = 0
+        self.last_key = None  # last string closed directly inside the top-level object
+        self.array_key = None  # key of the watched top-level array being scanned
+        self.element_start = None
+        self.started = False
+        self.emitted = 0
+
+    def feed(self, chunk: str) -> List[Tuple[str, object]]:
+        """Add text; return the (key, element) pairs completed by it."""
+        self.text += chunk
+        items = []
+        text = self.text
+        for i in range(self.position, len(text)):
+            char = text[i]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                    if self.depth == 1:
+                        self.last_key = text[self.string_start + 1:i]
+                continue
+            if not self.started:
+                if char == "{":
+                    self.started = True
+                    self.depth = 1
+                continue
+            if char == '"':
+                self.in_string = True
+                self.string_start = i
+            elif char in "{[":
+                if self.depth == 1 and char == "[":
+                    self.array_key = self.last_key if self.last_key in self.keys else None
+                elif self.depth == 2 and self.array_key is not None:
+                    self.element_start = i
+                self.depth += 1
+            elif char in "}]":
+                self.depth -= 1
+                if self.depth == 2 and self.array_key is not None and self.element_start is not None:
+                    try:
+                        items.append((self.array_key, json.loads(text[self.element_start:i + 1])))
+                    except ValueError:
+                        pass  # malformed element: left to the final parse of the whole response
+                    self.element_start = None
+                elif self.depth == 1:
+                    self.array_key = None
+        self.position = len(text)
+        self.emitted += len(items)
+        return items
+
+    def get_text(self) -> str:
+        """All text received so far."""
+        return self.text
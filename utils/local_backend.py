@@ -0,0 +1,324 @@
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from glob import glob
+from typing import Any, List, Optional
+import httpx
+import openai
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+START_TIME_PATTERN = re.compile(r"Start time:\s*([-\d.]+)")
+# Previous events in the prompt: "event_id=<id>, ..." (str(event)) or "[<id>] ..." lines (ContextBuilder)
+EVENT_ID_PATTERN = re.compile(r"event_id=([\w-]+)|^\[([\w-]+)\]", re.MULTILINE)
+
+
+class LocalBackend:
+    """
+    Deterministic offline stand-in for the OpenAI API.
+
+    Segment analysis requests (recognized by the "Start time:" line of the analysis prompts) are answered with
+    the recorded analysis of the segment starting at that time; other requests (storyline summaries) get an
+    extractive summary of the prompt. Latency and 429 errors can be injected to exercise the retry paths.
+
+    Configured from the environment:
+      LOCAL_RESPONSES_DIR  recorded analyses (default accident1/segment_analysis)
+      LOCAL_SEGMENT_STEP   seconds between segment starts, maps start time -> segment id (default 5)
+      LOCAL_LATENCY        seconds added to every chat request (default 0)
+      LOCAL_ERROR_RATE     fraction of chat requests answered with a 429 (default 0)
+      LOCAL_RETRY_AFTER_MS retry-after-ms sent with injected 429s (default 100)
+      LOCAL_SEED           seed for error injection (default 0)
+    """
+
+    def __init__(self, responses_dir: Optional[str] = None, segment_step: Optional[float] = None, latency: Optional[float] = None,
+                 error_rate: Optional[float] = None, retry_after_ms: Optional[int] = None, seed: Optional[int] = None):
+        responses_dir = responses_dir or os.getenv("LOCAL_RESPONSES_DIR", "accident1/segment_analysis")
+        self.recorded = {}
+        for path in glob(os.path.join(responses_dir, "segment_*.json")):
+            segment_id = os.path.basename(path)[len("segment_"):-len(".json")]
+            if segment_id.isdigit():
+                with open(path, encoding="utf-8") as f:
+                    self.recorded[int(segment_id)] = f.read()
+        self.segment_step = segment_step if segment_step is not None else float(os.getenv("LOCAL_SEGMENT_STEP", "5"))
+        self.latency = latency if latency is not None else float(os.getenv("LOCAL_LATENCY", "0"))
+        self.error_rate = error_rate if error_rate is not None else float(os.getenv("LOCAL_ERROR_RATE", "0"))
+        self.retry_after_ms = retry_after_ms if retry_after_ms is not None else int(os.getenv("LOCAL_RETRY_AFTER_MS", "100"))
+        self.random = random.Random(seed if seed is not None else int(os.getenv("LOCAL_SEED", "0")))
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    def _should_fail(self) -> bool:
+        with self.lock:
+            self.requests += 1
+            fail = self.error_rate > 0 and self.random.random() < self.error_rate
+            self.errors += fail
+            return fail
+
+    def _rate_limit_error(self) -> openai.RateLimitError:
+        response = httpx.Response(429, headers={"retry-after-ms": str(self.retry_after_ms)},
+                                  request=httpx.Request("POST", "http://local/v1/chat/completions"))
+        return openai.RateLimitError("Local backend injected rate limit", response=response, body=None)
+
+    def respond(self, messages) -> str:
+        """Deterministic response text for a chat request."""
+        text = _prompt_text(messages)
+        match = START_TIME_PATTERN.search(text)
+        if match and self.recorded:
+            segment_id = int(round(float(match.group(1)) / self.segment_step)) + 1
+            if segment_id not in self.recorded:
+                # Unknown time: pick a recording deterministically from the prompt
+                ids = sorted(self.recorded)
+                segment_id = ids[int(hashlib.sha1(text.encode("utf-8")).hexdigest(), 16) % len(ids)]
+            return self._relink(segment_id, text)
+        return extractive_summary(messages[-1]["content"] if isinstance(messages[-1]["content"], str) else text)
+
+    def _relink(self, segment_id: int, prompt: str) -> str:
+        """
+        Point recorded cause_event_ids at the event ids shown in the prompt's previous-event context.
+
+        The recorded links refer to the recorded ids, which the caller has replaced with its own. Each recorded
+        previous event is paired with the shown event whose text contains its description, so events left out
+        of the prompt (inactive, or dropped by a token budget) keep their recorded id and stay unlinked.
+        """
+        shown = _shown_events(prompt)
+        if not shown or segment_id - 1 not in self.recorded:
+            return self.recorded[segment_id]
+        try:
+            previous = json.loads(self.recorded[segment_id - 1])
+            result = json.loads(self.recorded[segment_id])
+        except ValueError:
+            return self.recorded[segment_id]
+        mapping = {}
+        for event in previous.get("events", []):
+            description = str(event.get("description") or "").strip()
+            if not description:
+                continue
+            for index, (prompt_id, text) in enumerate(shown):
+                if description in text:
+                    mapping[event.get("event_id")] = prompt_id
+                    del shown[index]
+                    break
+        for event in result.get("events", []):
+            if event.get("cause_event_id") in mapping:
+                event["cause_event_id"] = mapping[event["cause_event_id"]]
+        return json.dumps(result, ensure_ascii=False)
+
+    def completion(self, messages, model: str = "local") -> ChatCompletion:
+        content = self.respond(messages)
+        prompt_tokens = len(_prompt_text(messages)) // 4
+        with self.lock:
+            index = self.requests
+        return ChatCompletion.model_validate({
+            "id": f"chatcmpl-local-{index}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4,
+                      "total_tokens": prompt_tokens + len(content) // 4},
+        })
+
+
+def _prompt_text(messages) -> str:
+    parts = []
+    for message in messages:
+        content = message["content"]
+        if isinstance(content, str):
+            parts.append(content)
+        else:
+            parts.extend(part["text"] for part in content if part.get("type") == "text")
+    return "\n".join(parts)
+
+
+def _shown_events(prompt: str) -> List[tuple]:
+    """(event id, text up to the next event id) for every previous event listed in the prompt."""
+    matches = list(EVENT_ID_PATTERN.finditer(prompt))
+    return [(match.group(1) or match.group(2), prompt[match.end():matches[i + 1].start() if i + 1 < len(matches) else len(prompt)])
+            for i, match in enumerate(matches)]
+
+
+def extractive_summary(text: str, max_words: int = 50) -> str:
+    """First sentence of each line (time prefixes stripped), cut to max_words."""
+    sentences = []
+    for line in text.splitlines()[1:] or text.splitlines():
+        line = re.sub(r"^\[[^\]]*\]\s*", "", line.strip())
+        if line:
+            sentences.append(re.split(r"(?<=[.!?])\s|(?<=。)", line, maxsplit=1)[0])
+    words = " ".join(sentences).split()
+    return " ".join(words[:max_words])
+
+
+_local_backend = None
+_local_backend_lock = threading.Lock()
+
+
+def get_local_backend() -> LocalBackend:
+    """Process-wide backend, so replay state and error injection are shared by all local clients."""
+    global _local_backend
+    with _local_backend_lock:
+        if _local_backend is None:
+            _local_backend = LocalBackend()
+    return _local_backend
+
+
+STREAM_FIRST_TOKEN_SHARE = 0.2
+STREAM_CHUNK_CHARS = 64
+
+
+def _stream_chunks(completion: ChatCompletion, duration: float):
+    """Replay a completion as ChatCompletionChunks over `duration` seconds, ending with a usage-only chunk."""
+    content = completion.choices[0].message.content
+    pieces = [content[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(content), STREAM_CHUNK_CHARS)]
+    for piece in pieces:
+        if duration:
+            time.sleep(duration / len(pieces))
+        yield ChatCompletionChunk.model_validate({
+            "id": completion.id, "object": "chat.completion.chunk", "created": completion.created, "model": completion.model,
+            "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+        })
+    yield ChatCompletionChunk.model_validate({
+        "id": completion.id, "object": "chat.completion.chunk", "created": completion.created, "model": completion.model,
+        "choices": [], "usage": completion.usage.model_dump(),
+    })
+
+
+class _RawResponse:
+    def __init__(self, completion):
+        self.headers = {}
+        self.completion = completion
+
+    def parse(self):
+        return self.completion
+
+
+class _Completions:
+    def __init__(self, backend: LocalBackend, raw: bool = False):
+        self.backend = backend
+        self.raw = raw
+
+    @property
+    def with_raw_response(self) -> '_Completions':
+        return _Completions(self.backend, raw=True)
+
+    def create(self, messages, model: str = "local", stream: bool = False, **kwargs):
+        if stream:
+            # First token after a fifth of the latency; the rest is spread over the chunks
+            time.sleep(self.backend.latency * STREAM_FIRST_TOKEN_SHARE)
+        elif self.backend.latency:
+            time.sleep(self.backend.latency)
+        if self.backend._should_fail():
+            raise self.backend._rate_limit_error()
+        completion = self.backend.completion(messages, model)
+        if stream:
+            completion = _stream_chunks(completion, self.backend.latency * (1 - STREAM_FIRST_TOKEN_SHARE))
+        return _RawResponse(completion) if self.raw else completion
+
+
+class _AsyncCompletions(_Completions):
+    @property
+    def with_raw_response(self) -> '_AsyncCompletions':
+        return _AsyncCompletions(self.backend, raw=True)
+
+    async def create(self, messages, model: str = "local", **kwargs):
+        if self.backend.latency:
+            await asyncio.sleep(self.backend.latency)
+        if self.backend._should_fail():
+            raise self.backend._rate_limit_error()
+        completion = self.backend.completion(messages, model)
+        return _RawResponse(completion) if self.raw else completion
+
+
+class _Chat:
+    def __init__(self, completions):
+        self.completions = completions
+
+
+class LocalOpenAI:
+    """Drop-in for the parts of openai.OpenAI the pipeline uses (chat completions, raw responses, with_options)."""
+
+    def __init__(self, backend: Optional[LocalBackend] = None):
+        self.backend = backend or get_local_backend()
+        self.chat = _Chat(_Completions(self.backend))
+
+    def with_options(self, **kwargs) -> 'LocalOpenAI':
+        return self
+
+
+class AsyncLocalOpenAI(LocalOpenAI):
+    """Async counterpart of LocalOpenAI for the asyncio engine."""
+
+    def __init__(self, backend: Optional[LocalBackend] = None):
+        super().__init__(backend)
+        self.chat = _Chat(_AsyncCompletions(self.backend))
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic bag-of-words embeddings: word hashes are folded into a fixed-size signed vector."""
+
+    def __init__(self, dimensions: Optional[int] = None):
+        self.dimensions = dimensions or int(os.getenv("LOCAL_EMBEDDING_DIM", "256"))
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        for word in re.findall(r"\w+", text.lower()):
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            vector[value % self.dimensions] += 1.0 if (value >> 63) else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+class LocalChatModel(BaseChatModel):
+    """
+    Deterministic chat model for the RAG agent.
+
+    With tools bound, the first turn calls the first tool with the user's question; once tool results are
+    present it answers with them, so an agent run exercises retrieval end to end.
+    """
+
+    tool_names: List[str] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "local"
+
+    def bind_tools(self, tools, **kwargs) -> 'LocalChatModel':
+        names = [getattr(tool, "name", None) or tool.get("name") for tool in tools]
+        return self.model_copy(update={"tool_names": names})
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        backend = get_local_backend()
+        if backend.latency:
+            time.sleep(backend.latency)
+        question = next((m.content for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+        tool_results = [m.content for m in messages if isinstance(m, ToolMessage)]
+        if self.tool_names and not tool_results:
+            message = AIMessage(content="", tool_calls=[{
+                "name": self.tool_names[0], "args": {"__arg1": question}, "id": "call_local_0", "type": "tool_call"}])
+        elif tool_results:
+            message = AIMessage(content=extractive_summary("Results:\n" + "\n".join(tool_results), max_words=120))
+        else:
+            message = AIMessage(content=extractive_summary(question))
+        # Report usage like the real model so the agent's calls show up in utils.metrics
+        input_tokens = sum(len(str(m.content)) for m in messages) // 4
+        output_tokens = len(str(message.content)) // 4
+        message.usage_metadata = {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                                  "total_tokens": input_tokens + output_tokens}
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
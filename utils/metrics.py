@@ -0,0 +1,227 @@
+import contextvars
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from langchain_core.callbacks import BaseCallbackHandler
+
+# USD per 1M (prompt, completion) tokens, for the per-run cost estimate
+PRICES = {"gpt-4o": (2.50, 10.00), "gpt-4o-mini": (0.15, 0.60)}
+
+_tags = contextvars.ContextVar("metrics_tags", default={})
+
+
+@contextmanager
+def tagged(stage: Optional[str] = None, segment_id=None):
+    """Tag calls made in this context (thread or asyncio task) with a pipeline stage and segment id."""
+    tags = dict(_tags.get())
+    if stage is not None:
+        tags["stage"] = stage
+    if segment_id is not None:
+        tags["segment_id"] = segment_id
+    token = _tags.set(tags)
+    try:
+        yield
+    finally:
+        _tags.reset(token)
+
+
+def _prices(model: Optional[str]):
+    # API responses name dated snapshots (gpt-4o-2024-08-06); use the longest matching family
+    families = [name for name in PRICES if model and model.startswith(name)]
+    return PRICES[max(families, key=len)] if families else (0.0, 0.0)
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class MetricsRecorder:
+    """Per-call LLM metrics (tokens, latency, queueing, retries, cost) tagged by stage and segment."""
+
+    def __init__(self):
+        self.calls: List[dict] = []
+        self.observations: List[dict] = []  # non-call values, e.g. prompt context tokens saved
+        self.lock = threading.Lock()
+
+    def record(self, stage: Optional[str] = None, segment_id=None, model: Optional[str] = None, prompt_tokens: int = 0,
+               completion_tokens: int = 0, image_tokens: int = 0, latency: float = 0.0, queue_time: float = 0.0,
+               retries: int = 0, cached: bool = False, time_to_first_result: Optional[float] = None):
+        tags = _tags.get()
+        prices = _prices(model)
+        call = {
+            "stage": stage or tags.get("stage", "unknown"),
+            "segment_id": segment_id if segment_id is not None else tags.get("segment_id"),
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "image_tokens": image_tokens,
+            "latency": latency,
+            "queue_time": queue_time,
+            "retries": retries,
+            "cached": cached,
+            "cost_usd": 0.0 if cached else (prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1e6,
+            "time": time.time(),
+        }
+        if time_to_first_result is not None:
+            call["time_to_first_result"] = time_to_first_result
+        with self.lock:
+            self.calls.append(call)
+
+    def record_completion(self, response, messages, latency: float, queue_time: float = 0.0, retries: int = 0,
+                          model: Optional[str] = None, **kwargs):
+        """Record a ChatCompletion; image tokens are estimated from the request (usage does not split them out)."""
+        from utils.ratelimit import estimate_image_tokens
+        usage = getattr(response, "usage", None)
+        self.record(
+            model=model or getattr(response, "model", None),
+            prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+            completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+            image_tokens=estimate_image_tokens(messages),
+            latency=latency,
+            queue_time=queue_time,
+            retries=retries,
+            **kwargs
+        )
+
+    def observe(self, name: str, value: float, stage: Optional[str] = None, segment_id=None):
+        """Record a named non-negative amount (summed per stage and exported as a counter), tagged like calls."""
+        tags = _tags.get()
+        observation = {
+            "name": name,
+            "value": value,
+            "stage": stage or tags.get("stage", "unknown"),
+            "segment_id": segment_id if segment_id is not None else tags.get("segment_id"),
+            "time": time.time(),
+        }
+        with self.lock:
+            self.observations.append(observation)
+
+    def get_observations(self) -> List[dict]:
+        with self.lock:
+            return list(self.observations)
+
+    def get_calls(self) -> List[dict]:
+        with self.lock:
+            return list(self.calls)
+
+    def reset(self):
+        with self.lock:
+            self.calls = []
+            self.observations = []
+
+    def summary(self) -> Dict[str, dict]:
+        """Aggregates per stage."""
+        stages: Dict[str, List[dict]] = {}
+        for call in self.get_calls():
+            stages.setdefault(call["stage"], []).append(call)
+
+        report = {}
+        for stage, calls in stages.items():
+            latencies = [c["latency"] for c in calls if not c["cached"]]
+            first_results = [c["time_to_first_result"] for c in calls if "time_to_first_result" in c]
+            report[stage] = {
+                "calls": len(calls),
+                "cached": sum(c["cached"] for c in calls),
+                "segments": len({c["segment_id"] for c in calls if c["segment_id"] is not None}),
+                "prompt_tokens": sum(c["prompt_tokens"] for c in calls),
+                "completion_tokens": sum(c["completion_tokens"] for c in calls),
+                "image_tokens": sum(c["image_tokens"] for c in calls),
+                "retries": sum(c["retries"] for c in calls),
+                "cost_usd": round(sum(c["cost_usd"] for c in calls), 6),
+                "latency_total": sum(latencies),
+                "latency_p50": _percentile(latencies, 0.5),
+                "latency_p95": _percentile(latencies, 0.95),
+                "latency_max": max(latencies, default=0.0),
+                "queue_time_total": sum(c["queue_time"] for c in calls),
+            }
+            if first_results:
+                report[stage]["time_to_first_result_p50"] = _percentile(first_results, 0.5)
+        for observation in self.get_observations():
+            aggregates = report.setdefault(observation["stage"], {})
+            key = f"{observation['name']}_total"
+            aggregates[key] = aggregates.get(key, 0) + observation["value"]
+        return report
+
+    def write_json(self, path: str, include_calls: bool = True):
+        """Write the run report: stage aggregates and, optionally, every call."""
+        report = {"stages": self.summary()}
+        if include_calls:
+            report["calls"] = self.get_calls()
+            report["observations"] = self.get_observations()
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=4)
+
+    def to_prometheus(self, prefix: str = "video_understanding_llm") -> str:
+        """Stage aggregates in the Prometheus text exposition format."""
+        metrics = [
+            ("calls_total", "counter", "LLM calls", "calls"),
+            ("cache_hits_total", "counter", "LLM calls answered from the response cache", "cached"),
+            ("prompt_tokens_total", "counter", "Prompt tokens reported by the API", "prompt_tokens"),
+            ("completion_tokens_total", "counter", "Completion tokens reported by the API", "completion_tokens"),
+            ("image_tokens_total", "counter", "Estimated prompt tokens spent on images", "image_tokens"),
+            ("retries_total", "counter", "Retried attempts (429s and transient errors)", "retries"),
+            ("cost_usd_total", "counter", "Estimated cost in USD", "cost_usd"),
+            ("latency_seconds_sum", "counter", "Wall time of LLM calls", "latency_total"),
+            ("queue_seconds_sum", "counter", "Time spent waiting for the rate limiter", "queue_time_total"),
+            ("latency_seconds_p95", "gauge", "95th percentile LLM call latency", "latency_p95"),
+        ]
+        summary = self.summary()
+        lines = []
+        for name, metric_type, help_text, key in metrics:
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {metric_type}")
+            for stage, aggregates in sorted(summary.items()):
+                if key in aggregates:
+                    lines.append(f'{prefix}_{name}{{stage="{stage}"}} {aggregates[key]}')
+        observed = sorted({f"{o['name']}_total" for o in self.get_observations()})
+        for key in observed:
+            lines.append(f"# TYPE {prefix}_{key} counter")
+            for stage, aggregates in sorted(summary.items()):
+                if key in aggregates:
+                    lines.append(f'{prefix}_{key}{{stage="{stage}"}} {aggregates[key]}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """LangChain callback recording chat model calls (e.g. the RAG agent's) into a MetricsRecorder."""
+
+    def __init__(self, recorder: Optional[MetricsRecorder] = None, stage: str = "agent"):
+        self.recorder = recorder or get_metrics()
+        self.stage = stage
+        self.started: Dict[str, float] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self.started[str(run_id)] = time.perf_counter()
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self.started[str(run_id)] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        latency = time.perf_counter() - self.started.pop(str(run_id), time.perf_counter())
+        prompt_tokens = completion_tokens = 0
+        model = None
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                prompt_tokens += usage.get("input_tokens", 0)
+                completion_tokens += usage.get("output_tokens", 0)
+                model = (getattr(getattr(generation, "message", None), "response_metadata", None) or {}).get("model_name", model)
+        self.recorder.record(stage=self.stage, model=model, prompt_tokens=prompt_tokens,
+                             completion_tokens=completion_tokens, latency=latency)
+
+
+_metrics = MetricsRecorder()
+
+
+def get_metrics() -> MetricsRecorder:
+    """Process-wide recorder shared by all stages."""
+    return _metrics
@@ -0,0 +1,280 @@
+import asyncio
+import os
+import threading
+import time
+from typing import Mapping, Optional
+import openai
+from utils.metrics import get_metrics
+
+# Rough per-image prompt cost by detail level (high assumes a 16:9 frame scaled to 768px: 6 tiles)
+IMAGE_TOKENS = {"low": 85, "high": 85 + 170 * 6, "auto": 85 + 170 * 6}
+# Completion allowance counted against the tokens-per-minute budget for each request
+DEFAULT_COMPLETION_TOKENS = 1000
+# Errors worth retrying with exponential backoff (rate limits use the server's retry-after instead)
+TRANSIENT_ERRORS = (openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError)
+
+
+def estimate_image_tokens(messages) -> int:
+    """Estimated prompt tokens spent on the images of a chat request."""
+    tokens = 0
+    for message in messages:
+        if isinstance(message["content"], str):
+            continue
+        for part in message["content"]:
+            if part["type"] == "image_url":
+                tokens += IMAGE_TOKENS.get(part["image_url"].get("detail", "auto"), IMAGE_TOKENS["auto"])
+    return tokens
+
+
+def estimate_request_tokens(messages, completion_tokens: int = DEFAULT_COMPLETION_TOKENS) -> int:
+    """Estimate the tokens a chat request counts against the TPM limit (text ~4 chars/token plus images)."""
+    tokens = completion_tokens + estimate_image_tokens(messages)
+    for message in messages:
+        content = message["content"]
+        if isinstance(content, str):
+            tokens += len(content) // 4
+            continue
+        for part in content:
+            if part["type"] == "text":
+                tokens += len(part["text"]) // 4
+    return tokens
+
+
+def get_retry_after(error, default: float) -> float:
+    """Seconds to wait as advertised by a 429 response (retry-after-ms / retry-after headers)."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000.0
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return default
+
+
+class TokenBucketLimiter:
+    """Token-bucket limiter for requests and tokens per minute that adapts to 429s and rate-limit headers."""
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None):
+        self.requests_per_minute = requests_per_minute  # None disables the request bucket
+        self.tokens_per_minute = tokens_per_minute  # None disables the token bucket
+        self.request_bucket = float(requests_per_minute or 0)
+        self.token_bucket = float(tokens_per_minute or 0)
+        self.blocked_until = 0.0  # set from retry-after hints; nothing is granted before this
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'TokenBucketLimiter':
+        """Build a limiter from OPENAI_RPM_LIMIT / OPENAI_TPM_LIMIT; unset limits are not enforced."""
+        rpm = os.getenv("OPENAI_RPM_LIMIT")
+        tpm = os.getenv("OPENAI_TPM_LIMIT")
+        return cls(float(rpm) if rpm else None, float(tpm) if tpm else None)
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated
+        self.updated = now
+        if self.requests_per_minute:
+            self.request_bucket = min(self.requests_per_minute, self.request_bucket + elapsed * self.requests_per_minute / 60)
+        if self.tokens_per_minute:
+            self.token_bucket = min(self.tokens_per_minute, self.token_bucket + elapsed * self.tokens_per_minute / 60)
+
+    def _reserve(self, tokens: int) -> float:
+        """Take capacity for one request, or return how long to wait before trying again."""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self.blocked_until:
+                return self.blocked_until - now
+
+            wait = 0.0
+            if self.requests_per_minute and self.request_bucket < 1:
+                wait = (1 - self.request_bucket) * 60 / self.requests_per_minute
+            if self.tokens_per_minute:
+                # A single request larger than the whole budget waits for a full bucket instead of forever
+                needed = min(tokens, self.tokens_per_minute)
+                if self.token_bucket < needed:
+                    wait = max(wait, (needed - self.token_bucket) * 60 / self.tokens_per_minute)
+            if wait > 0:
+                return wait
+
+            if self.requests_per_minute:
+                self.request_bucket -= 1
+            if self.tokens_per_minute:
+                self.token_bucket -= min(tokens, self.tokens_per_minute)
+            return 0.0
+
+    def acquire(self, tokens: int = 0):
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: int = 0):
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def record_rate_limited(self, retry_after: float):
+        """Block all callers for retry_after seconds and empty the buckets after a 429."""
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+            self.request_bucket = 0.0
+            self.token_bucket = 0.0
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        """Clamp the buckets to the server's x-ratelimit-remaining-* view when it is lower than ours."""
+        with self.lock:
+            try:
+                if self.requests_per_minute and "x-ratelimit-remaining-requests" in headers:
+                    self.request_bucket = min(self.request_bucket, float(headers["x-ratelimit-remaining-requests"]))
+                if self.tokens_per_minute and "x-ratelimit-remaining-tokens" in headers:
+                    self.token_bucket = min(self.token_bucket, float(headers["x-ratelimit-remaining-tokens"]))
+            except ValueError:
+                pass
+
+
+def chat_completion_with_retry(client, limiter: TokenBucketLimiter, messages, max_retries: int = 5, **kwargs):
+    """
+    Create a chat completion through the limiter, waiting out 429s as long as the server asks.
+
+    The client's own retries are disabled so every 429 reaches the limiter. The call is recorded in
+    utils.metrics under the current stage/segment tags.
+
+    :return: ChatCompletion
+    """
+    tokens = estimate_request_tokens(messages)
+    client = client.with_options(max_retries=0)
+    queue_time = 0.0
+    for attempt in range(max_retries + 1):
+        start = time.perf_counter()
+        limiter.acquire(tokens)
+        queue_time += time.perf_counter() - start
+        start = time.perf_counter()
+        try:
+            raw = client.chat.completions.with_raw_response.create(messages=messages, **kwargs)
+        except openai.RateLimitError as e:
+            if attempt == max_retries:
+                raise
+            limiter.record_rate_limited(get_retry_after(e, default=2 ** attempt))
+            continue
+        except TRANSIENT_ERRORS:
+            if attempt == max_retries:
+                raise
+            time.sleep(2 ** attempt)
+            queue_time += 2 ** attempt
+            continue
+        latency = time.perf_counter() - start
+        limiter.update_from_headers(raw.headers)
+        response = raw.parse()
+        get_metrics().record_completion(response, messages, latency, queue_time=queue_time, retries=attempt, model=kwargs.get("model"))
+        return response
+
+
+def stream_chat_completion_with_retry(client, limiter: TokenBucketLimiter, messages, on_delta=None, on_retry=None,
+                                     max_retries: int = 5, **kwargs) -> str:
+    """
+    Streamed variant of chat_completion_with_retry; returns the completion text.
+
+    A connection drop or timeout while the stream is read is retried like one on the request itself; the request
+    is re-issued and the text is received again from the start.
+
+    :param on_delta: Called with each text delta as it arrives; a truthy return marks the first usable
+        result, whose delay is recorded as time_to_first_result in utils.metrics
+    :param on_retry: Called before a request is re-issued after the stream broke off, so the caller can
+        discard the deltas it has already consumed
+    """
+    tokens = estimate_request_tokens(messages)
+    client = client.with_options(max_retries=0)
+    queue_time = 0.0
+    for attempt in range(max_retries + 1):
+        start = time.perf_counter()
+        limiter.acquire(tokens)
+        queue_time += time.perf_counter() - start
+        start = time.perf_counter()
+        try:
+            raw = client.chat.completions.with_raw_response.create(
+                messages=messages, stream=True, stream_options={"include_usage": True}, **kwargs)
+        except openai.RateLimitError as e:
+            if attempt == max_retries:
+                raise
+            limiter.record_rate_limited(get_retry_after(e, default=2 ** attempt))
+            continue
+        except TRANSIENT_ERRORS:
+            if attempt == max_retries:
+                raise
+            time.sleep(2 ** attempt)
+            queue_time += 2 ** attempt
+            continue
+        limiter.update_from_headers(raw.headers)
+
+        parts = []
+        usage = None
+        model = kwargs.get("model")
+        first_result = None
+        try:
+            for chunk in raw.parse():
+                usage = chunk.usage or usage
+                model = chunk.model or model
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                delta = chunk.choices[0].delta.content
+                parts.append(delta)
+                if on_delta is not None and on_delta(delta) and first_result is None:
+                    first_result = time.perf_counter() - start
+        except TRANSIENT_ERRORS:
+            if attempt == max_retries:
+                raise
+            if on_retry is not None:
+                on_retry()
+            time.sleep(2 ** attempt)
+            queue_time += 2 ** attempt
+            continue
+        latency = time.perf_counter() - start
+
+        get_metrics().record(
+            model=model,
+            prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+            completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+            image_tokens=estimate_image_tokens(messages),
+            latency=latency,
+            queue_time=queue_time,
+            retries=attempt,
+            time_to_first_result=first_result
+        )
+        return "".join(parts)
+
+
+async def async_chat_completion_with_retry(client, limiter: TokenBucketLimiter, messages, max_retries: int = 5, **kwargs):
+    """Async counterpart of chat_completion_with_retry for AsyncOpenAI clients."""
+    tokens = estimate_request_tokens(messages)
+    client = client.with_options(max_retries=0)
+    queue_time = 0.0
+    for attempt in range(max_retries + 1):
+        start = time.perf_counter()
+        await limiter.acquire_async(tokens)
+        queue_time += time.perf_counter() - start
+        start = time.perf_counter()
+        try:
+            raw = await client.chat.completions.with_raw_response.create(messages=messages, **kwargs)
+        except openai.RateLimitError as e:
+            if attempt == max_retries:
+                raise
+            limiter.record_rate_limited(get_retry_after(e, default=2 ** attempt))
+            continue
+        except TRANSIENT_ERRORS:
+            if attempt == max_retries:
+                raise
+            await asyncio.sleep(2 ** attempt)
+            queue_time += 2 ** attempt
+            continue
+        latency = time.perf_counter() - start
+        limiter.update_from_headers(raw.headers)
+        response = raw.parse()
+        get_metrics().record_completion(response, messages, latency, queue_time=queue_time, retries=attempt, model=kwargs.get("model"))
+        return response